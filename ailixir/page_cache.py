@@ -0,0 +1,127 @@
+"""
+Full-page cache for anonymous visitors.
+
+Pages are stored under an explicit key per URL (host, path and sorted query
+string) and the versions of the tags they were cached with. invalidate()
+bumps the version of a tag, so every page cached under it is never read
+again and simply expires; the apps' signals call it when the models shown
+on those pages are saved or deleted. A hit costs two cache reads and no
+database query.
+
+Only anonymous, non-htmx GETs with no flash message pending are served
+from or stored to the cache, and only plain 200 responses are stored. The
+CSRF token of a stored page is swapped for the visitor's own on each hit.
+
+The tag versions must live in a cache every worker process shares (see
+CACHES in settings), or a save would only retire the pages of the worker
+that made it. On a per-process LocMemCache nothing is cached.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b'\x00csrf\x00'
+
+
+def _tag_key(tag):
+    return f'page-tag:{tag}'
+
+
+def tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    if len(versions) < len(keys):
+        # A version lost from the cache restarts from the clock, above any
+        # version the pages still cached were stored under
+        for key in keys:
+            if key not in versions:
+                cache.add(key, time.time_ns(), None)
+        versions = cache.get_many(keys)
+    return [versions.get(key, 0) for key in keys]
+
+
+def invalidate(*tags):
+    """Retires every page cached under any of the given tags."""
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), time.time_ns(), None)
+
+
+def is_shared(backend):
+    """Whether every worker process sees the same cache through backend."""
+    return not isinstance(backend, LocMemCache)
+
+
+def is_cacheable(request):
+    return (
+        is_shared(caches['default'])
+        and request.method == 'GET'
+        and not getattr(request, 'htmx', False)
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def page_key(request, versions):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'page:{digest}:{".".join(map(str, versions))}'
+
+
+def cache_anonymous_page(*tags, timeout=None, on_hit=None):
+    """
+    Caches a view's page for anonymous visitors under the given tags, which
+    may name the view's keyword arguments, as in 'post:{slug}'.
+
+    Views served from the cache do not run; on_hit(request, context) is
+    called instead, with the ``page_cache_context`` the view set on its
+    response when the page was stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not is_cacheable(request):
+                return view(request, *args, **kwargs)
+            key = page_key(request, tag_versions([tag.format(**kwargs) for tag in tags]))
+
+            cached = cache.get(key)
+            if cached is not None:
+                headers, content, context = cached
+                response = HttpResponse(content.replace(CSRF_PLACEHOLDER, get_token(request).encode()))
+                for header, value in headers:
+                    response[header] = value
+                if on_hit is not None:
+                    on_hit(request, context)
+                # Validators the view set when the page was stored still hold
+                last_modified = response.get('Last-Modified')
+                return get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=last_modified and parse_http_date_safe(last_modified),
+                    response=response,
+                )
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                content = CSRF_INPUT.sub(rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content)
+                context = getattr(response, 'page_cache_context', None)
+                page_timeout = timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+                cache.set(key, (list(response.items()), content, context), page_timeout)
+            return response
+        return wrapped
+    return decorator
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -117,6 +118,24 @@ DATABASES = {
     }
 }
 
+# Running under manage.py test
+TESTING = sys.argv[1:2] == ['test']
+
+# The page, fragment and herbal caches are shared by every worker process,
+# which is what lets a save in one worker retire what the others cached;
+# a per-process backend such as LocMemCache cannot. The file cache works
+# for workers on one box; point CACHE_BACKEND at Redis or Memcached to
+# share it across boxes.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache' / ('test' if TESTING else 'default'))),
+    }
+}
+if CACHE_BACKEND.endswith('.FileBasedCache'):
+  CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 if DEBUG:
   EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -191,3 +210,21 @@ ACCOUNT_EMAIL_VERIFICATION = 'mandatory'
 ACCOUNT_UNIQUE_EMAIL = True
 ACCOUNT_EMAIL_SUBJECT_PREFIX = 'Ailixir Global Limited - '
 
+
+# Herbal recommendation engine
+HERBAL_QUERY_CACHE_SIZE = int(os.getenv('HERBAL_QUERY_CACHE_SIZE', 1024))
+HERBAL_QUERY_CACHE_TTL = int(os.getenv('HERBAL_QUERY_CACHE_TTL', 300))
+HERBAL_RELOAD_INTERVAL = int(os.getenv('HERBAL_RELOAD_INTERVAL', 5))
+HERBAL_COLLAPSE_VARIANTS = os.getenv('HERBAL_COLLAPSE_VARIANTS', 'True') == 'True'
+HERBAL_FUZZY_MATCHING = os.getenv('HERBAL_FUZZY_MATCHING', 'True') == 'True'
+HERBAL_BACKEND = os.getenv('HERBAL_BACKEND', 'memory')
+HERBAL_SHARD_WORKERS = int(os.getenv('HERBAL_SHARD_WORKERS', 0))
+HERBAL_BATCH_MAX_SIZE = int(os.getenv('HERBAL_BATCH_MAX_SIZE', 100))
+
+# Blog
+# Tests flush buffered views by hand, without a background thread
+BLOG_VIEW_FLUSH_INTERVAL = int(os.getenv('BLOG_VIEW_FLUSH_INTERVAL', 0 if TESTING else 10))
+BLOG_FRAGMENT_CACHE_TIMEOUT = int(os.getenv('BLOG_FRAGMENT_CACHE_TIMEOUT', 86400))
+
+# Anonymous full-page cache, see ailixir.page_cache
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 600))
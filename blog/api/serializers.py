@@ -12,6 +12,23 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ['id', 'name', 'created_at']
 
+class SparseFieldsetMixin:
+    """
+    Lets clients pick the fields they need with ?fields=id,title,slug.
+    Unknown names are ignored; without any known name every field is kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if not requested:
+            return
+        keep = {name.strip() for name in requested.split(',')} & set(self.fields)
+        if keep:
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -65,6 +82,23 @@ class PostSerializer(serializers.ModelSerializer):
         
         return instance
 
+class PostListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Post summaries for list endpoints: no content body and no comments.
+    Expects the posts to come from Post.objects.for_list(), which loads
+    the author and tags of a whole page in two queries.
+    """
+    author = UserSerializer(read_only=True)
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'title', 'slug', 'excerpt', 'author', 'category', 'tags',
+            'featured_image', 'status', 'created_at', 'updated_at',
+            'published_at', 'views_count'
+        ]
+
 class PostCreateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), 
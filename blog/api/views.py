@@ -2,27 +2,25 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .serializers import PostSerializer, PostCreateSerializer, CategorySerializer, TagSerializer, CommentSerializer
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .serializers import PostSerializer, PostListSerializer, PostCreateSerializer, CategorySerializer, TagSerializer, CommentSerializer
+from blog import conditional, search as post_search
+from blog.counters import count_post_views, post_views
+from blog.pagination import KeysetPagination
 from blog.models import Post, Category, Tag, Comment
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class PostListCreateAPIView(generics.ListCreateAPIView):
     """
     List all posts or create a new post.
     """
-    serializer_class = PostSerializer
+    serializer_class = PostListSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = Post.objects.all().order_by('-created_at')
+        queryset = Post.objects.for_list().order_by('-created_at')
         
         # Filter by status (published only for non-staff users)
         if not self.request.user.is_staff:
@@ -31,11 +29,7 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
         # Search functionality
         search = self.request.query_params.get('search', None)
         if search is not None:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(content__icontains=search) |
-                Q(tags__name__icontains=search)
-            ).distinct()
+            queryset = post_search.search(queryset, search)
         
         # Filter by category
         category_id = self.request.query_params.get('category', None)
@@ -52,16 +46,18 @@ class PostListCreateAPIView(generics.ListCreateAPIView):
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return PostCreateSerializer
-        return PostSerializer
+        return PostListSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+@method_decorator(count_post_views, name='get')
+@method_decorator(condition(etag_func=conditional.post_etag, last_modified_func=conditional.post_last_modified), name='get')
 class PostDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a post instance.
     """
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_detail()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
@@ -86,11 +82,12 @@ class PostDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         super().check_object_permissions(request, obj)
 
     def retrieve(self, request, *args, **kwargs):
-        # Increment view count
+        # Views are buffered and written in batches, off the request path;
+        # count_post_views counts this one once the payload is answered
         instance = self.get_object()
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
-        return super().retrieve(request, *args, **kwargs)
+        instance.views_count += post_views.pending(instance.pk) + 1
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -107,12 +104,13 @@ def create_post_api(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@condition(etag_func=conditional.posts_etag, last_modified_func=conditional.posts_last_modified)
 @api_view(['GET'])
 def get_posts_api(request):
     """
     API endpoint for getting posts with filtering and pagination.
     """
-    posts = Post.objects.filter(status='published').order_by('-created_at')
+    posts = Post.objects.for_list().filter(status='published').order_by('-created_at')
     
     # Apply filters
     category_id = request.query_params.get('category', None)
@@ -125,19 +123,16 @@ def get_posts_api(request):
     
     search = request.query_params.get('search', None)
     if search:
-        posts = posts.filter(
-            Q(title__icontains=search) | 
-            Q(content__icontains=search) |
-            Q(tags__name__icontains=search)
-        ).distinct()
+        posts = post_search.search(posts, search)
     
     # Pagination
-    paginator = StandardResultsSetPagination()
+    paginator = KeysetPagination()
     paginated_posts = paginator.paginate_queryset(posts, request)
-    serializer = PostSerializer(paginated_posts, many=True, context={'request': request})
+    serializer = PostListSerializer(paginated_posts, many=True, context={'request': request})
     
     return paginator.get_paginated_response(serializer.data)
 
+@condition(etag_func=conditional.categories_etag, last_modified_func=conditional.categories_last_modified)
 @api_view(['GET'])
 def get_categories_api(request):
     """
@@ -147,6 +142,7 @@ def get_categories_api(request):
     serializer = CategorySerializer(categories, many=True)
     return Response(serializer.data)
 
+@condition(etag_func=conditional.tags_etag, last_modified_func=conditional.tags_last_modified)
 @api_view(['GET'])
 def get_tags_api(request):
     """
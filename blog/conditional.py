@@ -0,0 +1,129 @@
+"""
+Validators for conditional GETs of posts and of the API lists, for use
+with Django's condition() decorator: a request whose validators still
+match gets a 304 before the view loads a post or renders anything.
+
+Validators come from the database alone, so every worker computes the
+same ones. A post's ETag covers its updated_at and its category with the
+category's updated_at; its Last-Modified is the later of the two
+updated_at. The signals in blog.signals touch a post's updated_at when its
+comments or tags change or its category is deleted, which its own row
+would not show. Lists are stamped with aggregates: row counts catch
+deletions, the latest updated_at catches edits.
+
+views_count is not covered by any validator: blog.counters flushes it
+with update(), which leaves updated_at alone, so a revalidated page or
+payload may show a view count that is behind.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+
+from .models import Category, Post, Tag
+
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _once(request, name, compute):
+    """compute(), run once per request; the ETag and Last-Modified share it."""
+    attribute = f'_conditional_{name}'
+    if not hasattr(request, attribute):
+        setattr(request, attribute, compute())
+    return getattr(request, attribute)
+
+
+def post_stamp(request, slug):
+    """
+    (pk, updated_at, last modified, category id, category updated_at) of
+    the post at slug, or None.
+    """
+    def compute():
+        post = (
+            Post.objects.filter(slug=slug)
+            .values('pk', 'updated_at', 'category_id', 'category__updated_at')
+            .first()
+        )
+        if post is None:
+            return None
+        modified = max(filter(None, (post['updated_at'], post['category__updated_at'])))
+        return post['pk'], post['updated_at'], modified, post['category_id'], post['category__updated_at']
+    return _once(request, f'post:{slug}', compute)
+
+
+def post_etag(request, slug):
+    stamp = post_stamp(request, slug)
+    if stamp is None:
+        return None
+    pk, updated_at, _, category_id, category_updated_at = stamp
+    return _etag(pk, updated_at.isoformat(), category_id, category_updated_at and category_updated_at.isoformat())
+
+
+def post_last_modified(request, slug):
+    stamp = post_stamp(request, slug)
+    return stamp[2] if stamp is not None else None
+
+
+def post_page_etag(request, slug):
+    """
+    post_etag for the post page, which differs for signed-in visitors and
+    for htmx swaps. None while flash messages are pending.
+    """
+    if len(get_messages(request)):
+        return None
+    etag = post_etag(request, slug)
+    if etag is None:
+        return None
+    return _etag(etag, request.user.pk or 0, bool(getattr(request, 'htmx', False)))
+
+
+def post_page_last_modified(request, slug):
+    if len(get_messages(request)):
+        return None
+    return post_last_modified(request, slug)
+
+
+def _list_stamp(request, name, queryset):
+    """(count, latest updated_at) of queryset."""
+    def compute():
+        stamp = queryset.aggregate(count=Count('pk'), modified=Max('updated_at'))
+        return stamp['count'], stamp['modified']
+    return _once(request, name, compute)
+
+
+def posts_stamp(request):
+    """
+    _list_stamp of the published posts, with the count and latest id of
+    the tag links, which carry no timestamp.
+    """
+    def compute():
+        posts = Post.objects.filter(status='published').aggregate(count=Count('pk'), modified=Max('updated_at'))
+        links = Post.tags.through.objects.aggregate(count=Count('pk'), last=Max('pk'))
+        return posts['count'], posts['modified'], links['count'], links['last']
+    return _once(request, 'posts', compute)
+
+
+def posts_etag(request):
+    return _etag(*posts_stamp(request))
+
+
+def posts_last_modified(request):
+    return posts_stamp(request)[1]
+
+
+def categories_etag(request):
+    return _etag(*_list_stamp(request, 'categories', Category.objects.all()))
+
+
+def categories_last_modified(request):
+    return _list_stamp(request, 'categories', Category.objects.all())[1]
+
+
+def tags_etag(request):
+    return _etag(*_list_stamp(request, 'tags', Tag.objects.all()))
+
+
+def tags_last_modified(request):
+    return _list_stamp(request, 'tags', Tag.objects.all())[1]
@@ -0,0 +1,110 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import conditional
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Buffers post view increments in memory and writes them to the database
+    in batches, so viewing a post never writes to the database itself.
+
+    A daemon thread flushes the buffer every ``interval`` seconds, and once
+    more when the process exits; each flush is one F() update per distinct
+    increment, so concurrent workers and requests never lose a view. Views
+    buffered in a process that is killed outright are lost.
+    """
+
+    def __init__(self, model, field, interval=10):
+        self.model = model
+        self.field = field
+        self.interval = interval
+        self._reset()
+        atexit.register(self.flush)
+        # A forked worker starts with an empty buffer and its own thread
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def increment(self, pk):
+        with self._lock:
+            self._pending[pk] += 1
+            if self.interval and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name=f"{self.field}-flush", daemon=True)
+                self._thread.start()
+
+    def pending(self, pk):
+        """Views of pk buffered in this process and not yet flushed."""
+        with self._lock:
+            return self._pending[pk]
+
+    def flush(self):
+        """Writes the buffered views to the database, returning how many."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        batches = defaultdict(list)
+        for pk, count in pending.items():
+            batches[count].append(pk)
+        try:
+            with transaction.atomic():
+                for count, pks in batches.items():
+                    self.model.objects.filter(pk__in=pks).update(**{self.field: F(self.field) + count})
+        except Exception:
+            # Put the views back so the next flush retries them
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return sum(pending.values())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush buffered views")
+            finally:
+                connection.close()
+
+
+post_views = ViewCounter(Post, 'views_count', getattr(settings, 'BLOG_VIEW_FLUSH_INTERVAL', 10))
+
+
+def count_post_views(view):
+    """
+    Counts a view of the post at ``slug`` for each 200 or 304 that view
+    answers. Wrapped around the page cache and condition(), it counts the
+    pages and revalidations they answer without running the view as well.
+
+    The post is the one request.viewed_post_id names, set by the view or a
+    page cache hit, or else the one whose validators were just computed.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            post_id = getattr(request, 'viewed_post_id', None)
+            if post_id is None:
+                stamp = conditional.post_stamp(request, kwargs['slug'])
+                post_id = stamp and stamp[0]
+            if post_id is not None:
+                post_views.increment(post_id)
+        return response
+    return wrapped
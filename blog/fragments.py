@@ -0,0 +1,117 @@
+"""
+Cache of the rendered parts of a post page.
+
+The post body (category and tag badges, image and content) and its list of
+approved comments are rendered once and kept in the default cache, under
+keys holding the post's updated_at and a version counter. The signals in
+blog.signals bump the counter whenever a post, its comments or its tags
+change, so a stale fragment is never read again and simply expires.
+
+The counters and fragments must live in a cache every worker process
+shares (see CACHES in settings): a comment saved in one worker has to
+retire the fragments the others cached. On a per-process LocMemCache the
+fragments are rendered on every request instead.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ailixir.page_cache import is_shared
+
+from .models import Post, comments_prefetch
+
+FRAGMENTS = {
+    'body': 'blog/partials/post_body.html',
+    'comments': 'blog/partials/post_comments.html',
+}
+
+
+class PostFragmentCache:
+    """
+    Rendered post fragments in the default cache, counting this worker's
+    hits and misses.
+    """
+
+    def __init__(self, timeout=86400):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _version_key(self, post_id):
+        return f'blog:post-version:{post_id}'
+
+    def version(self, post_id):
+        key = self._version_key(post_id)
+        version = cache.get(key)
+        if version is None:
+            # A counter lost from the cache restarts from the clock, above
+            # any version the fragments still cached were stored under
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        return version
+
+    def bump(self, post_id):
+        """Retires every cached fragment of a post."""
+        try:
+            cache.incr(self._version_key(post_id))
+        except ValueError:
+            cache.set(self._version_key(post_id), time.time_ns(), None)
+
+    def keys(self, post, names):
+        version = self.version(post.pk)
+        stamp = post.updated_at.timestamp()
+        return {name: f'blog:post:{post.pk}:{stamp}:{version}:{name}' for name in names}
+
+    def get(self, post, names=tuple(FRAGMENTS)):
+        """
+        Returns the fragments of post named in names as {name: html},
+        rendering and caching those that were missing. Comments are only
+        loaded on a miss, unless they were prefetched already.
+        """
+        keys = self.keys(post, names)
+        found = cache.get_many(keys.values()) if is_shared(caches['default']) else {}
+        fragments = {name: mark_safe(found[key]) for name, key in keys.items() if key in found}
+        missing = [name for name in names if name not in fragments]
+        with self._lock:
+            self.hits += len(fragments)
+            self.misses += len(missing)
+        if missing:
+            fragments.update(self.render(post, {name: keys[name] for name in missing}))
+        return fragments
+
+    def render(self, post, keys):
+        """Renders the fragments of post named by keys and caches them there."""
+        if 'comments' in keys and 'comments' not in getattr(post, '_prefetched_objects_cache', {}):
+            prefetch_related_objects([post], comments_prefetch(approved_only=True))
+        rendered = {name: render_to_string(FRAGMENTS[name], {'post': post}) for name in keys}
+        if is_shared(caches['default']):
+            cache.set_many({keys[name]: html for name, html in rendered.items()}, self.timeout)
+        return rendered
+
+    def warm(self, post_ids):
+        """
+        Renders and caches every fragment of the given posts that are
+        published, returning how many were.
+        """
+        posts = Post.objects.for_detail(approved_only=True).filter(pk__in=post_ids, status='published')
+        for post in posts:
+            self.render(post, self.keys(post, FRAGMENTS))
+        return len(posts)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+
+post_fragments = PostFragmentCache(getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 86400))
@@ -0,0 +1,27 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from ailixir.page_cache import is_shared
+
+from blog.fragments import post_fragments
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Renders the cached body and comment fragments of published posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Posts to warm; all published posts by default.')
+        parser.add_argument('--latest', type=int, help='Only the given number of newest posts.')
+
+    def handle(self, *args, **options):
+        if not is_shared(caches['default']):
+            # The fragments would go to this command's own memory and die with it
+            raise CommandError('The default cache is per process; configure a shared one in CACHES')
+        posts = Post.objects.filter(status='published').order_by('-created_at', '-id')
+        if options['slugs']:
+            posts = posts.filter(slug__in=options['slugs'])
+        if options['latest']:
+            posts = posts[:options['latest']]
+        warmed = post_fragments.warm(list(posts.values_list('pk', flat=True)))
+        self.stdout.write(self.style.SUCCESS(f'Warmed the fragments of {warmed} posts'))
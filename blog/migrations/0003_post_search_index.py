@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, excerpt, content, tags)"
+    )
+    Post = apps.get_model('blog', 'Post')
+    for post in Post.objects.prefetch_related('tags').iterator(chunk_size=500):
+        schema_editor.execute(
+            "INSERT INTO blog_post_fts (rowid, title, excerpt, content, tags) VALUES (%s, %s, %s, %s, %s)",
+            [post.pk, post.title, strip_tags(post.excerpt), strip_tags(post.content),
+             ' '.join(tag.name for tag in post.tags.all())],
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS blog_post_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_attachment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -29,6 +29,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -41,6 +42,7 @@ class Category(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -49,6 +51,27 @@ class Tag(models.Model):
         return self.name
 
 
+def comments_prefetch(approved_only=False):
+    """Prefetch of a post's comments with their authors."""
+    comments = Comment.objects.select_related('author')
+    if approved_only:
+        comments = comments.filter(is_approved=True)
+    return models.Prefetch('comments', queryset=comments)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_list(self):
+        """Posts with their author, category and tags loaded in two queries."""
+        return self.select_related('author', 'category').prefetch_related('tags')
+
+    def for_detail(self, approved_only=False):
+        """
+        for_list, plus the comments and their authors; only the approved
+        comments with ``approved_only``, as the public pages show them.
+        """
+        return self.for_list().prefetch_related(comments_prefetch(approved_only))
+
+
 class Post(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -72,11 +95,15 @@ class Post(models.Model):
     published_at = models.DateTimeField(null=True, blank=True)
     
     views_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
+            # Keyset pagination order, see blog.pagination
+            models.Index(fields=['-created_at', '-id'], name='blog_post_created_id_idx'),
             models.Index(fields=['status']),
             models.Index(fields=['slug']),
         ]
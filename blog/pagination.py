@@ -0,0 +1,132 @@
+"""
+Keyset pagination for post lists.
+
+Pages are ordered by (-created_at, -id) and a cursor holds the last post
+of the previous page, so fetching any page is an index range scan of
+page_size + 1 rows however deep it is, and no COUNT(*) is run unless it
+is asked for. Search results are ordered by relevance, which is not a
+column, so their cursor holds an offset instead.
+
+Cursors are opaque to clients: base64 of a small JSON object.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KEYSET_ORDERING = ('-created_at', '-id')
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns the position a cursor stands for, raising ValueError if invalid."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(position, dict):
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def is_ranked(queryset):
+    """Whether a queryset comes ordered by search relevance, see blog.search."""
+    return 'search_rank' in queryset.query.annotations
+
+
+def paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of queryset after cursor as (posts, next cursor), the
+    next cursor being None on the last page. Raises ValueError on a
+    malformed cursor.
+    """
+    position = decode_cursor(cursor) if cursor else {}
+    if is_ranked(queryset):
+        try:
+            offset = max(int(position.get('o', 0)), 0)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        posts = list(queryset[offset:offset + page_size + 1])
+        next_position = {'o': offset + page_size}
+    else:
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        if position:
+            try:
+                created_at = datetime.fromisoformat(position['c'])
+                last_id = int(position['i'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError('Invalid cursor')
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+            )
+        posts = list(queryset[:page_size + 1])
+        if len(posts) > page_size:
+            last = posts[page_size - 1]
+            next_position = {'c': last.created_at.isoformat(), 'i': last.id}
+
+    # The extra row fetched only tells whether another page follows
+    if len(posts) <= page_size:
+        return posts, None
+    return posts[:page_size], encode_cursor(next_position)
+
+
+def wants_count(request):
+    """Counting every match is opt-in, with ?count=1."""
+    return request.GET.get('count', '').lower() in ('1', 'true', 'yes')
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination over blog.pagination.paginate. Takes ``cursor`` and
+    ``page_size`` query parameters; ``count=1`` adds the total count.
+    """
+    page_size = DEFAULT_PAGE_SIZE
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page_size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        page_size = min(max(page_size, 1), self.max_page_size)
+        self.count = queryset.count() if wants_count(request) else None
+        try:
+            posts, self.next_cursor = paginate(queryset, request.query_params.get('cursor'), page_size)
+        except ValueError as error:
+            raise NotFound(str(error))
+        return posts
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(remove_query_param(url, 'page'), 'cursor', self.next_cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
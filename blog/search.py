@@ -0,0 +1,105 @@
+"""
+Full-text search over blog posts.
+
+Posts are indexed in blog_post_fts, an SQLite FTS5 table holding each
+post's title, excerpt, content (with the HTML stripped) and tag names
+under the post's id. The signals in blog.signals keep it in sync. On
+other databases search falls back to case-insensitive LIKE matching.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+POST_FTS_TABLE = 'blog_post_fts'
+
+# bm25 column weights: title, excerpt, content, tags
+RANK_EXPRESSION = f'bm25({POST_FTS_TABLE}, 10.0, 4.0, 1.0, 6.0)'
+
+WORD_PATTERN = re.compile(r'\w+')
+
+TAGS_SQL = """
+    COALESCE((
+        SELECT group_concat(t.name, ' ') FROM blog_tag t
+        JOIN blog_post_tags pt ON pt.tag_id = t.id
+        WHERE pt.post_id = {post_id}
+    ), '')
+"""
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    FTS5 query matching posts that contain every word of query, each as a
+    word prefix ("herb rem" finds "herbal remedies"). Words are quoted, so
+    FTS5 syntax typed by a user is searched for literally.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_PATTERN.findall(query.lower()))
+
+
+def search(queryset, query):
+    """
+    Narrows a Post queryset to the posts matching query, most relevant
+    first, newest first among equally relevant ones. Each post carries its
+    bm25 ``search_rank``, lower being better.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not fts_enabled():
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct()
+    # The ORM cannot join a virtual table, so the matches are selected by
+    # rowid and each one's rank is looked up by its rowid
+    matches = f'SELECT rowid FROM {POST_FTS_TABLE} WHERE {POST_FTS_TABLE} MATCH %s'
+    rank = RawSQL(
+        f'SELECT {RANK_EXPRESSION} FROM {POST_FTS_TABLE}'
+        f' WHERE {POST_FTS_TABLE} MATCH %s AND rowid = blog_post.id',
+        [expression], output_field=FloatField(),
+    )
+    return (
+        queryset.filter(pk__in=RawSQL(matches, [expression]))
+        .annotate(search_rank=rank)
+        .order_by('search_rank', '-created_at', '-id')
+    )
+
+
+def index_post(post):
+    """Adds a post to the index, or refreshes its entry."""
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {POST_FTS_TABLE} (rowid, title, excerpt, content, tags)'
+            f' SELECT %s, %s, %s, %s, {TAGS_SQL.format(post_id="%s")}',
+            [post.pk, post.title, strip_tags(post.excerpt), strip_tags(post.content), post.pk],
+        )
+
+
+def index_post_tags(post_ids):
+    """Refreshes the tag names indexed for the given posts."""
+    post_ids = list(post_ids)
+    if not fts_enabled() or not post_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {POST_FTS_TABLE} SET tags = {TAGS_SQL.format(post_id=f"{POST_FTS_TABLE}.rowid")}'
+            f' WHERE rowid IN ({", ".join(["%s"] * len(post_ids))})',
+            post_ids,
+        )
+
+
+def unindex_post(post_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_FTS_TABLE} WHERE rowid = %s', [post_id])
@@ -1,11 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.core.mail import send_mass_mail
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.db import transaction
 
-from .models import Post
+from ailixir.page_cache import invalidate
+from . import search
+from .fragments import post_fragments
+from .models import Category, Comment, Post, Tag
 from newsletter.models import Subscriber
 
 @receiver(post_save, sender=Post)
@@ -36,4 +41,199 @@ def send_blog_notification(sender, instance, created, **kwargs):
             for subscriber in subscribers
         ]
 
-        send_mass_mail(messages, fail_silently=False)
\ No newline at end of file
+        send_mass_mail(messages, fail_silently=False)
+
+# Full-text search index, see blog.search
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    # Saves touching none of the indexed fields, like view counts, are skipped
+    if update_fields is None or {'title', 'excerpt', 'content'} & set(update_fields):
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def remember_cleared_posts(sender, instance, action, reverse, **kwargs):
+    # post_clear sends no pk_set, and by then the tag has no posts left;
+    # both receivers below read the posts it had from here
+    if action == 'pre_clear' and reverse:
+        instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_post_tags([instance.pk])
+    elif action == 'post_clear':
+        search.index_post_tags(getattr(instance, '_cleared_post_ids', []))
+    else:
+        search.index_post_tags(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_posts(sender, instance, created, **kwargs):
+    if not created:
+        search.index_post_tags(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_posts(sender, instance, **kwargs):
+    # The tag's links are gone by post_delete, without an m2m_changed signal
+    instance._tagged_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_deleted_tag_posts(sender, instance, **kwargs):
+    search.index_post_tags(getattr(instance, '_tagged_post_ids', []))
+
+
+# Rendered post fragments, see blog.fragments
+
+@receiver(post_save, sender=Post)
+def refresh_post_fragments(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    post_fragments.bump(instance.pk)
+    # Render a published post once now rather than on its first visit
+    if instance.status == 'published':
+        transaction.on_commit(lambda: post_fragments.warm([instance.pk]))
+
+
+@receiver(post_delete, sender=Post)
+def retire_post_fragments(sender, instance, **kwargs):
+    post_fragments.bump(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def retire_comment_fragments(sender, instance, **kwargs):
+    post_fragments.bump(instance.post_id)
+
+
+def retagged_post_ids(instance, action, reverse, pk_set):
+    """The posts whose tags an m2m_changed signal of Post.tags changed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return []
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_post_ids', [])
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def retire_tag_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    for post_id in retagged_post_ids(instance, action, reverse, pk_set):
+        post_fragments.bump(post_id)
+
+
+@receiver(post_save, sender=Tag)
+def retire_renamed_tag_fragments(sender, instance, created, **kwargs):
+    if not created:
+        for post_id in instance.posts.values_list('pk', flat=True):
+            post_fragments.bump(post_id)
+
+
+@receiver(post_delete, sender=Tag)
+def retire_deleted_tag_fragments(sender, instance, **kwargs):
+    for post_id in getattr(instance, '_tagged_post_ids', []):
+        post_fragments.bump(post_id)
+
+
+@receiver(post_save, sender=Category)
+def retire_renamed_category_fragments(sender, instance, created, **kwargs):
+    if not created:
+        for post_id in instance.posts.values_list('pk', flat=True):
+            post_fragments.bump(post_id)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_posts(sender, instance, **kwargs):
+    # Posts are moved out of the category before post_delete, by an update
+    instance._categorized_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def retire_deleted_category_fragments(sender, instance, **kwargs):
+    for post_id in getattr(instance, '_categorized_post_ids', []):
+        post_fragments.bump(post_id)
+
+
+# Post validators, see blog.conditional. Changes to what a post shows
+# that leave its row alone mark it modified.
+
+def touch_posts(post_ids):
+    post_ids = list(post_ids)
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_post(sender, instance, **kwargs):
+    touch_posts([instance.post_id])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_retagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    touch_posts(retagged_post_ids(instance, action, reverse, pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def touch_renamed_tag_posts(sender, instance, created, **kwargs):
+    if not created:
+        touch_posts(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def touch_deleted_tag_posts(sender, instance, **kwargs):
+    touch_posts(getattr(instance, '_tagged_post_ids', []))
+
+
+@receiver(post_delete, sender=Category)
+def touch_uncategorized_posts(sender, instance, **kwargs):
+    touch_posts(getattr(instance, '_categorized_post_ids', []))
+
+
+# Cached pages, see ailixir.page_cache. Comments are only shown to
+# signed-in visitors, whose pages are never cached.
+
+@receiver(pre_save, sender=Post)
+def remember_post_slug(sender, instance, **kwargs):
+    # A changed slug leaves the page cached under the old URL to retire
+    if instance.pk:
+        instance._cached_slug = Post.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views_count'}:
+        return
+    invalidate('posts', f'post:{instance.slug}')
+    old_slug = getattr(instance, '_cached_slug', None)
+    if old_slug and old_slug != instance.slug:
+        invalidate(f'post:{old_slug}')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tagged_post_pages(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Tagging many posts at once is rare enough to retire every post page
+    invalidate('posts', 'taxonomy' if reverse else f'post:{instance.slug}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_taxonomy_pages(sender, **kwargs):
+    invalidate('posts', 'taxonomy')
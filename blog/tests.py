@@ -1,3 +1,760 @@
-from django.test import TestCase
+import io
+import re
+import threading
+import unittest
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.template import Context
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import counters, search
+from .counters import ViewCounter
+from .fragments import post_fragments
+from .models import Category, Comment, Post, Tag
+from .pagination import decode_cursor, encode_cursor, paginate
+
+
+def setUpModule():
+    # Views go to a counter of the tests' own, never to the module's, whose
+    # views would be flushed at exit into the database the tests left
+    global post_views
+    post_views = ViewCounter(Post, 'views_count', interval=0)
+    for module in ('blog.counters', 'blog.views', 'blog.api.views'):
+        patcher = mock.patch(f'{module}.post_views', post_views)
+        patcher.start()
+        unittest.addModuleCleanup(patcher.stop)
+    unittest.addModuleCleanup(post_views.flush)
+
+
+def create_posts(count, author, tags=(), category=None, comments=0):
+    """Published posts, each with the given tags and a few comments."""
+    posts = []
+    for number in range(count):
+        post = Post.objects.create(
+            title=f'Herbal post {number}', author=author, category=category,
+            content=f'<p>Body of herbal post {number}</p>', status='published',
+        )
+        post.tags.set(tags)
+        for _ in range(comments):
+            Comment.objects.create(post=post, author=author, content='Thanks')
+        posts.append(post)
+    return posts
+
+
+@contextmanager
+def forbid_lazy_queries():
+    """
+    Fails with an AssertionError when a template loads a related object or
+    manager that the view did not select_related() or prefetch_related().
+    Related managers and foreign keys tag their querysets with the instance
+    they hang off, which tells a lazy relation load apart from a query a
+    template runs on purpose (a context processor's queryset, say).
+    """
+    rendering = []
+    render = Template.render
+    fetch_all = QuerySet._fetch_all
+
+    def tracked_render(template, context):
+        rendering.append(template.name)
+        try:
+            return render(template, context)
+        finally:
+            rendering.pop()
+
+    def guarded_fetch_all(queryset):
+        instance = queryset._hints.get('instance')
+        if rendering and queryset._result_cache is None and instance is not None:
+            raise AssertionError(
+                f'{rendering[-1]} lazily loaded {queryset.model.__name__} objects of '
+                f'{type(instance).__name__} {instance.pk}; load them in the view'
+            )
+        return fetch_all(queryset)
+
+    with mock.patch.object(Template, 'render', tracked_render), \
+            mock.patch.object(QuerySet, '_fetch_all', guarded_fetch_all):
+        yield
+
+
+class PostListAPIQueryTests(TestCase):
+    """List endpoints run a fixed number of queries whatever the page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        category = Category.objects.create(name='Remedies')
+        tags = [Tag.objects.create(name=name) for name in ('Moringa', 'Neem', 'Ginger')]
+        create_posts(60, cls.author, tags, category, comments=2)
+
+    def setUp(self):
+        # Middleware setup runs its own queries on the client's first request
+        self.client.get(reverse('blog:api-posts-list'))
+
+    def test_post_list_query_count_is_fixed(self):
+        # The page of posts with their authors, then their tags
+        for page_size in (5, 20, 50):
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                response = self.client.get(reverse('blog:api-post-list-create'), {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_posts_api_query_count_is_fixed(self):
+        # Two more for the validators of conditional GETs, see blog.conditional
+        for page_size in (5, 20, 50):
+            with self.subTest(page_size=page_size), self.assertNumQueries(4):
+                response = self.client.get(reverse('blog:api-posts-list'), {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_search_query_count_is_fixed(self):
+        for page_size in (5, 20):
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                self.client.get(reverse('blog:api-post-list-create'), {'search': 'herbal', 'page_size': page_size})
+
+    def test_list_omits_content_and_comments(self):
+        post = self.client.get(reverse('blog:api-posts-list')).json()['results'][0]
+        self.assertNotIn('content', post)
+        self.assertNotIn('comments', post)
+        self.assertEqual(len(post['tags']), 3)
+        self.assertEqual(post['author']['username'], 'writer')
+
+    def test_sparse_fieldsets(self):
+        post = self.client.get(reverse('blog:api-posts-list'), {'fields': 'id,title,bogus'}).json()['results'][0]
+        self.assertEqual(set(post), {'id', 'title'})
+
+    def test_detail_query_count_is_fixed(self):
+        post = Post.objects.first()
+        # The post's validators, then the post with its author and
+        # category, its tags, its comments with their authors
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('blog:api-post-detail', args=[post.slug]))
+        self.assertEqual(len(response.json()['comments']), 2)
+
+
+class PostPageQueryTests(TestCase):
+    """Blog pages load every relation their templates use up front."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        category = Category.objects.create(name='Remedies')
+        tags = [Tag.objects.create(name=name) for name in ('Moringa', 'Neem')]
+        cls.posts = create_posts(12, cls.author, tags, category, comments=3)
+        held = Comment.objects.filter(post=cls.posts[-1]).first()
+        Comment.objects.filter(pk=held.pk).update(is_approved=False, content='Held for review')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guard_catches_lazy_loads(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        template = Template('{% for tag in post.tags.all %}{{ tag }}{% endfor %}')
+        with forbid_lazy_queries(), self.assertRaisesMessage(AssertionError, 'lazily loaded Tag'):
+            template.render(Context({'post': post}))
+        post = Post.objects.for_list().get(pk=post.pk)
+        with forbid_lazy_queries():
+            self.assertEqual(template.render(Context({'post': post})), 'MoringaNeem')
+
+    def test_post_list(self):
+        with forbid_lazy_queries():
+            response = self.client.get(reverse('blog:post_list'))
+        self.assertEqual(len(response.context['posts']), 10)
+
+    def test_post_list_search(self):
+        with forbid_lazy_queries():
+            response = self.client.get(reverse('blog:post_list'), {'q': 'herbal'})
+        self.assertEqual(len(response.context['posts']), 10)
+
+    def test_post_detail_shows_approved_comments(self):
+        self.client.force_login(self.author)
+        with forbid_lazy_queries():
+            response = self.client.get(reverse('blog:post_detail', args=[self.posts[-1].slug]))
+        self.assertContains(response, 'Thanks', count=2)
+        self.assertNotContains(response, 'Held for review')
+
+
+class HtmxFragmentTests(TestCase):
+    """htmx swaps get the page content without the site layout."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.post, = create_posts(1, author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_full_page_without_htmx(self):
+        response = self.client.get(reverse('blog:post_detail', args=[self.post.slug]))
+        self.assertContains(response, '<!DOCTYPE html>')
+        self.assertContains(response, 'Herbal post 0')
+        self.assertIn('HX-Request', response['Vary'])
+
+    def test_fragment_for_htmx(self):
+        for url in (reverse('blog:post_detail', args=[self.post.slug]), reverse('blog:post_list')):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'HX-Request': 'true'})
+                self.assertNotContains(response, '<!DOCTYPE html>')
+                self.assertContains(response, 'Herbal post 0')
+                self.assertIn('HX-Request', response['Vary'])
+
+    def test_full_page_for_boosted_links(self):
+        response = self.client.get(
+            reverse('blog:post_list'), headers={'HX-Request': 'true', 'HX-Boosted': 'true'}
+        )
+        self.assertContains(response, '<!DOCTYPE html>')
+
+
+class PostFragmentCacheTests(TestCase):
+    """Post bodies and comment lists are rendered once per version."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.tag = Tag.objects.create(name='Moringa')
+
+    def setUp(self):
+        cache.clear()
+        self.post, = create_posts(1, self.author, [self.tag], comments=1)
+        self.url = reverse('blog:post_detail', args=[self.post.slug])
+        self.client.force_login(self.author)
+
+    def get(self):
+        before = post_fragments.stats()
+        response = self.client.get(self.url)
+        after = post_fragments.stats()
+        return response, after['hits'] - before['hits'], after['misses'] - before['misses']
+
+    def test_cached_after_first_render(self):
+        response, hits, misses = self.get()
+        self.assertEqual((hits, misses), (0, 2))
+        response, hits, misses = self.get()
+        self.assertEqual((hits, misses), (2, 0))
+        self.assertContains(response, 'Body of herbal post 0')
+        self.assertContains(response, 'Thanks')
+
+    def test_comments_retire_fragments(self):
+        self.get()
+        Comment.objects.create(post=self.post, author=self.author, content='Very useful')
+        response, hits, misses = self.get()
+        self.assertEqual(misses, 2)
+        self.assertContains(response, 'Very useful')
+        Comment.objects.filter(post=self.post).get(content='Very useful').delete()
+        response, hits, misses = self.get()
+        self.assertEqual(misses, 2)
+        self.assertNotContains(response, 'Very useful')
+
+    def test_tags_retire_fragments(self):
+        self.get()
+        self.post.tags.add(Tag.objects.create(name='Neem'))
+        self.assertContains(self.get()[0], 'Neem')
+        self.tag.name = 'Baobab'
+        self.tag.save()
+        self.assertContains(self.get()[0], 'Baobab')
+
+    def test_categories_retire_fragments(self):
+        category = Category.objects.create(name='Remedies')
+        self.post.category = category
+        self.post.save()
+        anonymous = Client()
+        for client in (self.client, anonymous):
+            self.assertContains(client.get(self.url), 'Remedies')
+        category.name = 'Tonics'
+        category.save()
+        for client in (self.client, anonymous):
+            response = client.get(self.url)
+            self.assertContains(response, 'Tonics')
+            self.assertNotContains(response, 'Remedies')
+        category.delete()
+        for client in (self.client, anonymous):
+            self.assertNotContains(client.get(self.url), 'Tonics')
+
+    def test_edits_retire_fragments(self):
+        self.get()
+        self.post.content = '<p>Revised body</p>'
+        self.post.save()
+        self.assertContains(self.get()[0], 'Revised body')
+
+    def test_stats_are_for_staff(self):
+        url = reverse('blog:fragment_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.filter(pk=self.author.pk).update(is_staff=True)
+        self.assertEqual(set(self.client.get(url).json()), {'hits', 'misses', 'hit_rate'})
+
+    def test_warm(self):
+        self.assertEqual(post_fragments.warm([self.post.pk]), 1)
+        self.assertEqual(self.get()[1:], (2, 0))
+
+    def test_comments_reach_other_workers(self):
+        self.get()
+        # Another worker process, with its own client of the shared cache
+        with mock.patch('blog.fragments.cache', caches.create_connection('default')):
+            Comment.objects.create(post=self.post, author=self.author, content='Very useful')
+        response, hits, misses = self.get()
+        self.assertEqual(misses, 2)
+        self.assertContains(response, 'Very useful')
+
+    def test_warm_command(self):
+        call_command('warm_post_fragments', stdout=io.StringIO())
+        with mock.patch('blog.fragments.cache', caches.create_connection('default')):
+            self.assertEqual(self.get()[1:], (2, 0))
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(CommandError):
+                call_command('warm_post_fragments', stdout=io.StringIO())
+            # Rendered every time rather than kept per process
+            self.assertEqual(self.get()[1:], (0, 2))
+            self.assertEqual(self.get()[1:], (0, 2))
+
+    def test_publishing_warms(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='Freshly published', author=self.author, content='<p>News</p>', status='published',
+            )
+        self.url = reverse('blog:post_detail', args=[post.slug])
+        self.assertEqual(self.get()[1:], (2, 0))
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Logged-out visitors get post pages from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.tag = Tag.objects.create(name='Moringa')
+        cls.post, = create_posts(1, cls.author, [cls.tag])
+        cls.url = reverse('blog:post_detail', args=[cls.post.slug])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_pages_run_no_queries(self):
+        for url in (reverse('blog:post_list'), self.url):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.status_code, 200)
+                self.assertContains(second, 'Herbal post 0')
+
+    def test_query_strings_are_keyed_apart(self):
+        self.client.get(reverse('blog:post_list'), {'q': 'herbal'})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('blog:post_list') + '?q=herbal')
+        response = self.client.get(reverse('blog:post_list'), {'q': 'nothing'})
+        self.assertNotContains(response, 'Herbal post 0')
+
+    def test_cached_views_still_count(self):
+        self.client.get(self.url)
+        pending = post_views.pending(self.post.pk)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        self.assertEqual(post_views.pending(self.post.pk), pending + 1)
+
+    def test_visitors_get_their_own_csrf_token(self):
+        self.client.get(self.url)
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(self.url)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode())[1]
+        response = client.post(reverse('blog:add_comment', args=[self.post.slug]), {'csrfmiddlewaretoken': token})
+        # Past the CSRF check, to the login requirement
+        self.assertEqual(response.json(), {'error': 'You must be logged in to comment'})
+
+    def test_not_cached_for_htmx_or_signed_in_visitors(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, headers={'HX-Request': 'true'})
+        self.assertNotContains(response, '<!DOCTYPE html>')
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), 'No comments yet.')
+
+    def test_not_cached_with_pending_messages(self):
+        self.client.get(self.url)
+        self.client.post(reverse('contact-us'), {'name': 'Ada', 'email': 'ada@example.com'})
+        self.assertContains(self.client.get(self.url), 'Thank You for contacting Us.')
+        self.assertNotContains(self.client.get(self.url), 'Thank You for contacting Us.')
+
+    def test_saves_invalidate(self):
+        self.client.get(self.url)
+        self.client.get(reverse('blog:post_list'))
+        self.post.title = 'Renamed herbal post'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Renamed herbal post')
+        self.assertContains(self.client.get(reverse('blog:post_list')), 'Renamed herbal post')
+        self.tag.name = 'Neem'
+        self.tag.save()
+        self.assertContains(self.client.get(self.url), 'Neem')
+
+
+class ConditionalGetTests(TestCase):
+    """Unchanged posts and lists are answered with 304 Not Modified."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.tag = Tag.objects.create(name='Moringa')
+        Category.objects.create(name='Remedies')
+        cls.post, = create_posts(1, cls.author, [cls.tag], comments=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, headers={'If-None-Match': response['ETag']})
+
+    def test_api_endpoints(self):
+        urls = [
+            reverse('blog:api-post-detail', args=[self.post.slug]),
+            reverse('blog:api-posts-list'),
+            reverse('blog:api-categories-list'),
+            reverse('blog:api-tags-list'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+                response = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_the_serializer(self):
+        url = reverse('blog:api-post-detail', args=[self.post.slug])
+        response = self.client.get(url)
+        # The post's validators only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_not_modified_still_counts_a_view(self):
+        for name in ('blog:post_detail', 'blog:api-post-detail'):
+            with self.subTest(name=name):
+                url = reverse(name, args=[self.post.slug])
+                response = self.client.get(url)
+                pending = post_views.pending(self.post.pk)
+                # The page's 304 comes from the page cache, then from condition()
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+                cache.clear()
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+                self.assertEqual(post_views.pending(self.post.pk), pending + 2)
+                self.assertEqual(self.client.get(reverse(name, args=['missing'])).status_code, 404)
+                self.assertEqual(post_views.pending(self.post.pk), pending + 2)
+
+    def test_changes_are_modified(self):
+        url = reverse('blog:api-post-detail', args=[self.post.slug])
+        changes = [
+            lambda: Comment.objects.create(post=self.post, author=self.author, content='More'),
+            lambda: Comment.objects.filter(post=self.post).first().delete(),
+            lambda: self.post.tags.add(Tag.objects.create(name='Neem')),
+            lambda: self.post.tags.remove(self.tag),
+            lambda: Post.objects.get(pk=self.post.pk).save(),
+        ]
+        for change in changes:
+            response = self.client.get(url)
+            change()
+            self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_changes_are_modified_since(self):
+        url = reverse('blog:api-post-detail', args=[self.post.slug])
+
+        def rename_tag():
+            tag = Tag.objects.get(name='Baobab')
+            tag.name = 'Hibiscus'
+            tag.save()
+
+        changes = [
+            lambda: Comment.objects.create(post=self.post, author=self.author, content='More'),
+            lambda: Comment.objects.filter(post=self.post).first().delete(),
+            lambda: self.post.tags.add(Tag.objects.create(name='Neem')),
+            lambda: self.post.tags.clear(),
+            lambda: Tag.objects.create(name='Baobab').posts.add(self.post),
+            rename_tag,
+            lambda: Tag.objects.get(name='Hibiscus').delete(),
+        ]
+        for change in changes:
+            # Last-Modified has whole seconds; start each change an hour back
+            Post.objects.filter(pk=self.post.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+            response = self.client.get(url)
+            change()
+            response = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+            self.assertEqual(response.status_code, 200)
+
+    def test_uncategorizing_is_modified_since(self):
+        category = Category.objects.get()
+        hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.filter(pk=self.post.pk).update(category=category, updated_at=hour_ago)
+        Category.objects.filter(pk=category.pk).update(updated_at=hour_ago)
+        url = reverse('blog:api-post-detail', args=[self.post.slug])
+        response = self.client.get(url)
+        category.delete()
+        response = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_are_the_same_in_every_worker(self):
+        url = reverse('blog:api-post-detail', args=[self.post.slug])
+        etag = self.client.get(url)['ETag']
+        # Nothing the validators rest on is kept in a worker or its cache
+        cache.clear()
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+
+    def test_category_changes_are_modified(self):
+        category = Category.objects.get()
+        Post.objects.filter(pk=self.post.pk).update(category=category)
+        for url in (reverse('blog:api-post-detail', args=[self.post.slug]),
+                    reverse('blog:post_detail', args=[self.post.slug])):
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url)
+                category.name = f'{category.name} renamed'
+                category.save()
+                self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_list_changes_are_modified(self):
+        for url, change in [
+            (reverse('blog:api-posts-list'), lambda: self.post.tags.clear()),
+            (reverse('blog:api-categories-list'), lambda: Category.objects.get().save()),
+            (reverse('blog:api-tags-list'), lambda: self.tag.delete()),
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                change()
+                self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_post_page(self):
+        url = reverse('blog:post_detail', args=[self.post.slug])
+        response = self.client.get(url)
+        # Served from the anonymous page cache, validators included
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.client.force_login(self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Comment.objects.create(post=self.post, author=self.author, content='More')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages cover every post exactly once, in a stable order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('writer', 'writer@example.com', 'password')
+        cls.posts = create_posts(25, author)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, queryset, page_size):
+        pages, cursor = [], None
+        while True:
+            posts, cursor = paginate(queryset, cursor, page_size)
+            pages.append([post.pk for post in posts])
+            if cursor is None:
+                return pages
+
+    def test_keyset_order(self):
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        for page_size in (1, 7, 25, 30):
+            with self.subTest(page_size=page_size):
+                pages = self.walk(Post.objects.all(), page_size)
+                self.assertEqual(sum(pages, []), expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+        self.assertEqual(set(decode_cursor(paginate(Post.objects.all(), None, 10)[1])), {'c', 'i'})
+
+    def test_ties_on_created_at(self):
+        Post.objects.update(created_at=self.posts[0].created_at)
+        pages = self.walk(Post.objects.all(), 4)
+        self.assertEqual(sum(pages, []), sorted((post.pk for post in self.posts), reverse=True))
+
+    def test_search_uses_an_offset_cursor(self):
+        ranked = search.search(Post.objects.all(), 'herbal')
+        posts, cursor = paginate(ranked, None, 10)
+        self.assertEqual(decode_cursor(cursor), {'o': 10})
+        pages = self.walk(ranked, 10)
+        self.assertEqual(sum(pages, []), [post.pk for post in ranked])
+        self.assertEqual(len(set(sum(pages, []))), 25)
+
+    def test_invalid_cursors(self):
+        for cursor in ('not-base64!', encode_cursor([1]), encode_cursor({'c': 'yesterday', 'i': 1})):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    paginate(Post.objects.all(), cursor)
+                self.assertEqual(self.client.get(reverse('blog:post_list'), {'cursor': cursor}).status_code, 404)
+                self.assertEqual(self.client.get(reverse('blog:api-posts-list'), {'cursor': cursor}).status_code, 404)
+        response = self.client.get(reverse('blog:post_list'), {'q': 'herbal', 'cursor': encode_cursor({'o': 'x'})})
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_shape(self):
+        url = reverse('blog:api-posts-list')
+        response = self.client.get(url, {'page_size': 20}).json()
+        self.assertEqual(set(response), {'next', 'results'})
+        self.assertEqual(len(response['results']), 20)
+        response = self.client.get(response['next']).json()
+        self.assertEqual((response['next'], len(response['results'])), (None, 5))
+        response = self.client.get(url, {'count': 1}).json()
+        self.assertEqual(set(response), {'next', 'results', 'count'})
+        self.assertEqual(response['count'], 25)
+
+    def test_count_on_the_page(self):
+        self.assertContains(self.client.get(reverse('blog:post_list'), {'count': 1}), '25 posts')
+        self.assertNotIn('count', self.client.get(reverse('blog:post_list')).context)
+
+    def test_load_more(self):
+        response = self.client.get(reverse('blog:post_list'))
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'href="{reverse("blog:post_list")}?cursor={cursor}"')
+        # Without htmx the link opens the next page in full
+        self.assertContains(self.client.get(reverse('blog:post_list'), {'cursor': cursor}), '<!DOCTYPE html>')
+        response = self.client.get(reverse('blog:post_list'), {'cursor': cursor}, headers={'HX-Request': 'true'})
+        self.assertNotContains(response, '<!DOCTYPE html>')
+        self.assertEqual(len(response.context['posts']), 10)
+
+
+class ViewCounterTests(TestCase):
+    """Buffered post views reach the database exactly once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+
+    def setUp(self):
+        self.posts = create_posts(3, self.author)
+        # No flush thread; the tests flush by hand
+        self.counter = ViewCounter(Post, 'views_count', interval=0)
+
+    def views(self):
+        return [post.views_count for post in Post.objects.order_by('pk')]
+
+    def test_flush_batches_increments(self):
+        for post, views in zip(self.posts, (2, 2, 1)):
+            for _ in range(views):
+                self.counter.increment(post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.counter.flush(), 5)
+        # One update per distinct increment
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.views(), [2, 2, 1])
+        self.assertEqual(self.counter.pending(self.posts[0].pk), 0)
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_failed_flush_keeps_the_views(self):
+        self.counter.increment(self.posts[0].pk)
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.counter.flush()
+        self.assertEqual(self.counter.pending(self.posts[0].pk), 1)
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.views(), [1, 0, 0])
+
+    def test_increments_are_added_to_the_stored_count(self):
+        self.counter.increment(self.posts[0].pk)
+        # Another worker flushed its own views meanwhile
+        Post.objects.filter(pk=self.posts[0].pk).update(views_count=F('views_count') + 5)
+        self.counter.flush()
+        self.assertEqual(self.views(), [6, 0, 0])
+
+    def test_concurrent_increments_are_not_lost(self):
+        pk = self.posts[0].pk
+
+        def view():
+            for _ in range(500):
+                self.counter.increment(pk)
+
+        threads = [threading.Thread(target=view) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.counter.pending(pk), 2000)
+
+        # A view counted while a flush is writing waits for the next one
+        update = QuerySet.update
+
+        def update_and_view(queryset, **kwargs):
+            self.counter.increment(pk)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_and_view):
+            self.assertEqual(self.counter.flush(), 2000)
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.views(), [2001, 0, 0])
+
+
+class PostSearchIndexTests(TestCase):
+    """The signals keep blog_post_fts in step with posts and their tags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'password')
+
+    def setUp(self):
+        self.moringa = Tag.objects.create(name='Moringa')
+        self.neem = Tag.objects.create(name='Neem')
+        self.first, self.second = create_posts(2, self.author)
+
+    def found(self, query):
+        return list(search.search(Post.objects.all(), query).values_list('pk', flat=True))
+
+    def indexed(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT title, content, tags FROM {search.POST_FTS_TABLE} WHERE rowid = %s', [post.pk])
+            return cursor.fetchone()
+
+    def test_create_and_edit(self):
+        self.assertEqual(self.indexed(self.first), ('Herbal post 0', 'Body of herbal post 0', ''))
+        self.first.title = 'Ginger tea'
+        self.first.save()
+        self.assertEqual(self.found('ginger'), [self.first.pk])
+        self.first.delete()
+        self.assertEqual(self.found('ginger'), [])
+
+    def test_view_count_saves_are_skipped(self):
+        Post.objects.filter(pk=self.first.pk).update(title='Ginger tea')
+        self.first.refresh_from_db()
+        self.first.views_count += 1
+        self.first.save(update_fields=['views_count'])
+        self.assertEqual(self.found('ginger'), [])
+        self.first.save(update_fields=['title'])
+        self.assertEqual(self.found('ginger'), [self.first.pk])
+
+    def test_tagging_a_post(self):
+        self.first.tags.add(self.moringa, self.neem)
+        self.assertEqual(self.found('moringa'), [self.first.pk])
+        self.first.tags.remove(self.moringa)
+        self.assertEqual((self.found('moringa'), self.found('neem')), ([], [self.first.pk]))
+        self.first.tags.clear()
+        self.assertEqual(self.found('neem'), [])
+
+    def test_tagging_from_the_tag(self):
+        self.moringa.posts.add(self.first, self.second)
+        self.assertCountEqual(self.found('moringa'), [self.first.pk, self.second.pk])
+        self.moringa.posts.remove(self.first)
+        self.assertEqual(self.found('moringa'), [self.second.pk])
+        self.moringa.posts.clear()
+        self.assertEqual(self.found('moringa'), [])
+
+    def test_clearing_a_tag_retires_fragments(self):
+        self.moringa.posts.add(self.first, self.second)
+        versions = [post_fragments.version(post.pk) for post in (self.first, self.second)]
+        self.moringa.posts.clear()
+        self.assertTrue(all(
+            post_fragments.version(post.pk) > version
+            for post, version in zip((self.first, self.second), versions)
+        ))
+
+    def test_tag_rename_and_delete(self):
+        self.moringa.posts.add(self.first)
+        self.moringa.name = 'Baobab'
+        self.moringa.save()
+        self.assertEqual((self.found('moringa'), self.found('baobab')), ([], [self.first.pk]))
+        self.moringa.delete()
+        self.assertEqual(self.found('baobab'), [])
+        self.assertEqual(self.indexed(self.first)[2], '')
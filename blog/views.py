@@ -1,11 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import Http404, JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.views.decorators.http import require_http_methods, require_POST
+from django.views.decorators.http import condition, require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_vary_headers
+from ailixir.page_cache import cache_anonymous_page
+from . import conditional, search
+from .counters import count_post_views, post_views
+from .fragments import post_fragments
+from .pagination import paginate, wants_count
 from .models import Post, Category, Tag, Comment
 from .forms import PostForm, CommentForm
 
@@ -15,6 +20,28 @@ from django.core.files.storage import default_storage
 from django.http import JsonResponse
 from .models import Attachment
 
+FRAGMENT_TEMPLATE = 'blog/partials/fragment.html'
+
+def wants_fragment(request):
+    """
+    Whether an htmx request swaps the page content only. Boosted links and
+    history restores replace the whole body, so they get the full page.
+    """
+    htmx = request.htmx
+    return bool(htmx) and not htmx.boosted and not htmx.history_restore_request
+
+def render_page(request, template_name, context):
+    """
+    Renders a blog page, or only its content block for an htmx swap; see
+    templates/blog/partials/fragment.html. Both come from the same URL, so
+    the response varies on HX-Request.
+    """
+    if wants_fragment(request):
+        context['base_template'] = FRAGMENT_TEMPLATE
+    response = render(request, template_name, context)
+    patch_vary_headers(response, ('HX-Request',))
+    return response
+
 @require_POST
 def summernote_upload(request):
     """Handles Summernote image upload."""
@@ -62,49 +89,60 @@ def summernote_delete(request):
 
     return JsonResponse({'deleted': True})
 
+@cache_anonymous_page('site', 'taxonomy', 'posts')
 def post_list(request):
     context = {}
     """Display list of blog posts"""
-    posts = Post.objects.all().order_by('-created_at')
+    posts = Post.objects.for_list().order_by('-created_at')
     
     # Search functionality
     search_query = request.GET.get('q')
     if search_query:
         search_query = search_query.strip()
         context['q'] = search_query
-        posts = posts.filter(
-            Q(title__icontains=search_query) | 
-            Q(content__icontains=search_query) |
-            Q(tags__name__icontains=search_query)
-        ).distinct()
-    
-    # Pagination
-    paginator = Paginator(posts, 10)  # Show 10 posts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    context['posts'] = page_obj
-        
+        posts = search.search(posts, search_query)
     
-    if request.htmx:
-        return render(request, 'blog/post_list.html', context)
-    return render(request, 'blog/post_list.html', context)
+    # Keyset pagination: "Load more" asks htmx for the cards after a cursor
+    if wants_count(request):
+        context['count'] = posts.count()
+    try:
+        context['posts'], context['next_cursor'] = paginate(posts, request.GET.get('cursor'))
+    except ValueError:
+        raise Http404('Invalid cursor')
+
+    if request.htmx and request.GET.get('cursor'):
+        response = render(request, 'blog/partials/post_cards.html', context)
+        patch_vary_headers(response, ('HX-Request',))
+        return response
+    return render_page(request, 'blog/post_list.html', context)
+
+def count_cached_view(request, context):
+    """Cached post pages still count their views, see count_post_views."""
+    request.viewed_post_id = context['post_id']
 
+@count_post_views
+@cache_anonymous_page('site', 'taxonomy', 'post:{slug}', on_hit=count_cached_view)
+@condition(etag_func=conditional.post_page_etag, last_modified_func=conditional.post_page_last_modified)
 def post_detail(request, slug):
     """Display individual blog post"""
-    post = get_object_or_404(Post, slug=slug)
+    post = get_object_or_404(Post.objects.for_list(), slug=slug)
     
-    # Increment view count
-    post.views_count += 1
-    post.save(update_fields=['views_count'])
+    # Views are buffered and written in batches, off the request path;
+    # count_post_views counts this one once the page is answered
+    request.viewed_post_id = post.pk
+    post.views_count += post_views.pending(post.pk) + 1
     
+    # The body and comments come rendered from the cache; only signed-in
+    # visitors see the comments
+    names = ('body', 'comments') if request.user.is_authenticated else ('body',)
     context = {
         'post': post,
+        'fragments': post_fragments.get(post, names),
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_detail.html', context)
-    return render(request, 'blog/post_detail.html', context)
+    response = render_page(request, 'blog/post_detail.html', context)
+    response.page_cache_context = {'post_id': post.pk}
+    return response
 
 @login_required
 def post_create(request):
@@ -120,7 +158,7 @@ def post_create(request):
             messages.success(request, 'Post created successfully!')
             
             if request.htmx:
-                return render(request, 'blog/post_detail.html', {'post': post})
+                return render_page(request, 'blog/post_detail.html', {'post': Post.objects.for_detail(approved_only=True).get(pk=post.pk)})
             return redirect('blog:post_detail', slug=post.slug)
     else:
         form = PostForm()
@@ -129,9 +167,7 @@ def post_create(request):
         'form': form,
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_form.html', context)
-    return render(request, 'blog/post_form.html', context)
+    return render_page(request, 'blog/post_form.html', context)
 
 @login_required
 def post_edit(request, slug):
@@ -150,7 +186,7 @@ def post_edit(request, slug):
             messages.success(request, 'Post updated successfully!')
             
             if request.htmx:
-                return render(request, 'blog/post_detail.html', {'post': post})
+                return render_page(request, 'blog/post_detail.html', {'post': Post.objects.for_detail(approved_only=True).get(pk=post.pk)})
             return redirect('blog:post_detail', slug=post.slug)
     else:
         form = PostForm(instance=post)
@@ -160,9 +196,7 @@ def post_edit(request, slug):
         'post': post,
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_form.html', context)
-    return render(request, 'blog/post_form.html', context)
+    return render_page(request, 'blog/post_form.html', context)
 
 @login_required
 def post_update(request, slug):
@@ -178,13 +212,13 @@ def post_update(request, slug):
         if form.is_valid():
             post = form.save()
             form.save_m2m()
-            return render(request, 'blog/post_detail.html', {'post': post})
+            return render_page(request, 'blog/post_detail.html', {'post': Post.objects.for_detail(approved_only=True).get(pk=post.pk)})
         else:
             context = {
                 'form': form,
                 'post': post,
             }
-            return render(request, 'blog/post_form.html', context)
+            return render_page(request, 'blog/post_form.html', context)
     
     return redirect('blog:post_edit', slug=slug)
 
@@ -204,14 +238,13 @@ def post_delete(request, slug):
         messages.success(request, f'Post "{post_title}" deleted successfully!')
         
         # Return the post list after deletion
-        posts = Post.objects.all().order_by('-created_at')
-        paginator = Paginator(posts, 10)
-        page_obj = paginator.get_page(1)
+        posts, next_cursor = paginate(Post.objects.for_list())
         
         context = {
-            'posts': page_obj,
+            'posts': posts,
+            'next_cursor': next_cursor,
         }
-        return render(request, 'blog/post_list.html', context)
+        return render_page(request, 'blog/post_list.html', context)
     
     return redirect('blog:post_detail', slug=slug)
 
@@ -239,33 +272,34 @@ def add_comment(request, slug):
     
     return JsonResponse({'error': 'Invalid form data'}, status=400)
 
+@staff_member_required
+def fragment_cache_stats(request):
+    """Hit/miss counters of this worker's post fragment cache."""
+    return JsonResponse(post_fragments.stats())
+
 def category_posts(request, category_slug):
     """Display posts by category"""
     category = get_object_or_404(Category, slug=category_slug)
-    posts = Post.objects.filter(category=category, status='published').order_by('-created_at')
+    posts = Post.objects.for_list().filter(category=category, status='published').order_by('-created_at')
     
     context = {
         'posts': posts,
         'category': category,
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_list.html', context)
-    return render(request, 'blog/post_list.html', context)
+    return render_page(request, 'blog/post_list.html', context)
 
 def tag_posts(request, tag_slug):
     """Display posts by tag"""
     tag = get_object_or_404(Tag, slug=tag_slug)
-    posts = Post.objects.filter(tags=tag, status='published').order_by('-created_at')
+    posts = Post.objects.for_list().filter(tags=tag, status='published').order_by('-created_at')
     
     context = {
         'posts': posts,
         'tag': tag,
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_list.html', context)
-    return render(request, 'blog/post_list.html', context)
+    return render_page(request, 'blog/post_list.html', context)
 
 def search_posts(request):
     """Search for posts"""
@@ -273,17 +307,11 @@ def search_posts(request):
     posts = Post.objects.none()
     
     if query:
-        posts = Post.objects.filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct().order_by('-created_at')
+        posts = search.search(Post.objects.for_list(), query)
     
     context = {
         'posts': posts,
         'query': query,
     }
     
-    if request.htmx:
-        return render(request, 'blog/post_list.html', context)
-    return render(request, 'blog/post_list.html', context)
+    return render_page(request, 'blog/post_list.html', context)
@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for ailixir.
+
+With HERBAL_SHARED_MEMORY=True (the default) the app and the herbal
+dataset are loaded once in the master process, and forked workers share
+them copy-on-write instead of each loading its own copy.
+"""
+
+import os
+
+wsgi_app = 'ailixir.wsgi:application'
+workers = int(os.getenv('WEB_CONCURRENCY', 3))
+preload_app = os.getenv('HERBAL_SHARED_MEMORY', 'True') == 'True'
+
+
+def when_ready(server):
+    if preload_app:
+        from index.utils.herbal_analyzer import preload_herbal_database
+        from index.utils.herbal_memory import format_usage, memory_usage
+
+        preload_herbal_database()
+        server.log.info("Herbal dataset preloaded in master: %s", format_usage(memory_usage()))
+
+
+def post_request(worker, req, environ, resp):
+    # Logged once per worker, after its first request: straight after the
+    # fork every page is still shared, so the figures would say nothing.
+    # For the steady state, run manage.py herbal_memory --pid <master pid>
+    # once the workers are warm.
+    if getattr(worker, 'memory_logged', False):
+        return
+    worker.memory_logged = True
+    from index.utils.herbal_memory import format_usage, memory_usage
+
+    worker.log.info("Worker %s after its first request: %s", worker.pid, format_usage(memory_usage()))
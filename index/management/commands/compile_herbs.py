@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from index.utils.herbal_analyzer import HERBAL_DATASET_PATH
+from index.utils.herbal_store import CompiledDataset, compile_dataset, compiled_path
+
+
+class Command(BaseCommand):
+    help = 'Compiles the herbal CSV dataset into the memory-mappable binary form used at startup.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=str(HERBAL_DATASET_PATH), help='CSV dataset to compile.')
+        parser.add_argument('--force', action='store_true', help='Recompile even if the compiled file is current.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            if not options['force']:
+                try:
+                    if CompiledDataset(compiled_path(path)).is_current(path):
+                        self.stdout.write(f"{compiled_path(path)} is up to date.")
+                        return
+                except (OSError, ValueError):
+                    pass
+            started = time.perf_counter()
+            out_path = compile_dataset(path)
+        except OSError as error:
+            raise CommandError(error)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        dataset = CompiledDataset(out_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {len(dataset)} rows x {len(dataset.columns)} columns to {out_path} in {elapsed:.1f} ms"
+        ))
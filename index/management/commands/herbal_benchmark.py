@@ -0,0 +1,119 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from index.utils.herbal_analyzer import (
+    analyze_herbal_symptoms, build_herbal_index, query_cache, swap_herbal_index,
+)
+from index.utils.herbal_index import HerbalIndex, extract_keywords
+from index.utils.herbal_shards import ShardedIndex
+
+DEFAULT_QUERIES = [
+    "fever, headache",
+    "pain",
+    "malaria diabetes",
+    "skin infections and burns",
+    "nausea after meals, poor digestion",
+    "cold cough sore throat",
+]
+
+
+def legacy_scan(herbs, symptoms_text, limit=5):
+    """The original per-herb substring loop, kept as the benchmark baseline."""
+    keywords = re.findall(r'\b[a-z]+\b', symptoms_text.lower())
+    results = []
+    for herb in herbs:
+        searchable_text = " ".join([
+            herb["name"], herb["description"],
+            herb["uses"]
+        ]).lower()
+        score = sum(1 for kw in keywords if kw in searchable_text)
+        if score > 0:
+            results.append({**herb, "score": score})
+    results.sort(key=lambda x: x["score"], reverse=True)
+    return results[:limit]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the herbal recommendation engines against the original scan loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Symptom phrases to run (defaults to a built-in set).')
+        parser.add_argument('--repeat', type=int, default=20, help='Times each query is run per engine.')
+        parser.add_argument('--limit', type=int, default=5)
+        parser.add_argument('--no-collapse', action='store_true',
+                            help='Index every variant row instead of canonical herbs.')
+        parser.add_argument('--workers', type=int, nargs='+', default=[],
+                            help='Also benchmark sharded scoring with each of these worker counts.')
+        parser.add_argument('--scale', type=int, default=1,
+                            help='Repeat the rows this many times for the sharded benchmark.')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        repeat = options['repeat']
+        limit = options['limit']
+
+        started = time.perf_counter()
+        index = build_herbal_index(collapse=not options['no_collapse'])
+        elapsed = (time.perf_counter() - started) * 1000
+        rows = index if options['no_collapse'] else build_herbal_index(collapse=False)
+        self.stdout.write(f"Indexed {len(index.herbs)} herbs from {len(rows.herbs)} rows in "
+                          f"{elapsed:.1f} ms")
+        # Every engine, the baseline loop included, scans the same herbs
+        self.stdout.write(f"Each engine searches the {len(index.herbs)} "
+                          f"{'rows' if options['no_collapse'] else 'canonical herbs'}")
+        swap_herbal_index(index)
+        # Measure the engines themselves, not the result cache
+        query_cache.maxsize = 0
+
+        engines = [
+            ('legacy loop', lambda q: legacy_scan(index.herbs, q, limit)),
+            ('index/substring', lambda q: analyze_herbal_symptoms(q, limit, match='substring')),
+            ('index/token', lambda q: analyze_herbal_symptoms(q, limit)),
+            ('bm25', lambda q: analyze_herbal_symptoms(q, limit, ranking='bm25')),
+            ('tfidf', lambda q: analyze_herbal_symptoms(q, limit, ranking='tfidf')),
+        ]
+        baseline = None
+        for name, engine in engines:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for query in queries:
+                    engine(query)
+            per_query = (time.perf_counter() - started) * 1000 / (repeat * len(queries))
+            baseline = baseline or per_query
+            self.stdout.write(f"{name:<18} {per_query:9.3f} ms/query  x{baseline / per_query:6.1f}")
+
+        if options['workers']:
+            self.benchmark_shards(rows, queries, repeat, limit, options['workers'], options['scale'])
+
+    def benchmark_shards(self, rows, queries, repeat, limit, worker_counts, scale):
+        """Times sharded against in-process scoring of every dataset row."""
+        herbs = rows.herbs * scale
+        started = time.perf_counter()
+        index = HerbalIndex(herbs, rows.synonym_weights)
+        self.stdout.write(f"\nIndexed {len(herbs)} rows for sharding in "
+                          f"{time.perf_counter() - started:.1f} s")
+        keywords = [sorted(set(extract_keywords(query))) for query in queries]
+
+        def run(ranker):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for query in keywords:
+                    ranker.rank(query, [], limit)
+            return (time.perf_counter() - started) * 1000 / (repeat * len(keywords))
+
+        baseline = run(index)
+        self.stdout.write(f"{'in process':<18} {baseline:9.3f} ms/query  x{1:6.1f}")
+        for workers in worker_counts:
+            sharded = ShardedIndex(index, workers)
+            try:
+                # Wait for every shard to be built before timing
+                exact = all(
+                    sharded.rank(query, [], limit) == index.rank(query, [], limit) for query in keywords
+                )
+                per_query = run(sharded)
+            finally:
+                sharded.shutdown()
+            self.stdout.write(f"{f'{len(sharded)} shards':<18} {per_query:9.3f} ms/query  "
+                              f"x{baseline / per_query:6.1f}{'' if exact else '  (results differ!)'}")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from index.utils import herbal_analyzer
+from index.utils.herbal_memory import child_pids, format_usage, memory_usage
+
+
+class Command(BaseCommand):
+    help = ('Reports memory used by the herbal dataset: per gunicorn worker with --pid, '
+            'or in this process before and after loading it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, help='Gunicorn master pid; reports it and every worker.')
+
+    def handle(self, *args, **options):
+        if options['pid']:
+            return self.report_workers(options['pid'])
+
+        before = memory_usage()
+        herbal_analyzer.load_herbal_database()
+        after = memory_usage()
+        self.stdout.write(f"Before load: {format_usage(before)}")
+        self.stdout.write(f"After load:  {format_usage(after)}")
+        self.stdout.write(f"{len(herbal_analyzer.herbal_database)} herbs cost "
+                          f"{(after['rss'] - before['rss']) / 1024:.1f}MB of RSS")
+
+    def report_workers(self, master_pid):
+        try:
+            pids = [master_pid] + child_pids(master_pid)
+            usages = [memory_usage(pid) for pid in pids]
+        except OSError as error:
+            raise CommandError(error)
+
+        for pid, usage in zip(pids, usages):
+            role = 'master' if pid == master_pid else 'worker'
+            self.stdout.write(f"{role:<6} {pid:>7}  {format_usage(usage)}")
+        total_rss = sum(usage['rss'] for usage in usages) / 1024
+        total_pss = sum(usage['pss'] for usage in usages) / 1024
+        self.stdout.write(f"Total RSS {total_rss:.1f}MB, actual (PSS) {total_pss:.1f}MB")
@@ -0,0 +1,48 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from index.models import Herb
+from index.utils.herbal_analyzer import HERBAL_DATASET_PATH, herb_from_row, read_herbal_rows
+from index.utils.herbal_db import HERB_FTS_TABLE
+
+
+class Command(BaseCommand):
+    help = 'Imports the herbal CSV dataset into the Herb table and its full-text index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=str(HERBAL_DATASET_PATH), help='CSV dataset to import.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk insert.')
+        parser.add_argument('--replace', action='store_true', help='Delete all existing herbs first.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        started = time.perf_counter()
+        rows = (Herb(**herb_from_row(row)) for row in read_herbal_rows(options['path']))
+        imported = 0
+        try:
+            # Rows stream in chunk by chunk, so memory use does not grow
+            # with the dataset; the FTS triggers index each inserted row
+            with transaction.atomic():
+                if options['replace']:
+                    Herb.objects.all().delete()
+                while chunk := list(islice(rows, chunk_size)):
+                    Herb.objects.bulk_create(chunk)
+                    imported += len(chunk)
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"INSERT INTO {HERB_FTS_TABLE}({HERB_FTS_TABLE}) VALUES ('optimize')")
+        except OSError as error:
+            raise CommandError(error)
+        # Results cached from the old rows are retired by the new table
+        # version, see herbal_db.table_version
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} herbs ({Herb.objects.count()} in total) in {elapsed:.2f} s"
+        ))
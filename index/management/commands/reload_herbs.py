@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from index.utils.herbal_analyzer import HERBAL_DATASET_PATH, HERBAL_RELOAD_INTERVAL
+from index.utils.herbal_store import CompiledDataset, compile_dataset
+
+
+class Command(BaseCommand):
+    help = ('Recompiles the herbal dataset so running workers rebuild their indexes '
+            'in the background and swap them in without a restart.')
+
+    def handle(self, *args, **options):
+        try:
+            dataset = CompiledDataset(compile_dataset(HERBAL_DATASET_PATH))
+        except OSError as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(f"Compiled {len(dataset)} herbs from {HERBAL_DATASET_PATH}."))
+        if HERBAL_RELOAD_INTERVAL:
+            self.stdout.write(f"Workers will pick it up within {HERBAL_RELOAD_INTERVAL}s of their next request.")
+        else:
+            self.stdout.write(self.style.WARNING(
+                "HERBAL_RELOAD_INTERVAL is 0, so workers only pick it up after a restart."
+            ))
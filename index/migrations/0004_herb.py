@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+# Full-text index over the searched fields of index_herb, an external
+# content FTS5 table kept in sync with it by triggers. SQLite only.
+FTS_SQL = [
+    """CREATE VIRTUAL TABLE index_herb_fts USING fts5(
+        name, description, uses, content='index_herb', content_rowid='id'
+    )""",
+    """CREATE TRIGGER index_herb_fts_insert AFTER INSERT ON index_herb BEGIN
+        INSERT INTO index_herb_fts(rowid, name, description, uses)
+        VALUES (new.id, new.name, new.description, new.uses);
+    END""",
+    """CREATE TRIGGER index_herb_fts_delete AFTER DELETE ON index_herb BEGIN
+        INSERT INTO index_herb_fts(index_herb_fts, rowid, name, description, uses)
+        VALUES ('delete', old.id, old.name, old.description, old.uses);
+    END""",
+    """CREATE TRIGGER index_herb_fts_update AFTER UPDATE ON index_herb BEGIN
+        INSERT INTO index_herb_fts(index_herb_fts, rowid, name, description, uses)
+        VALUES ('delete', old.id, old.name, old.description, old.uses);
+        INSERT INTO index_herb_fts(rowid, name, description, uses)
+        VALUES (new.id, new.name, new.description, new.uses);
+    END""",
+]
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS index_herb_fts_update",
+    "DROP TRIGGER IF EXISTS index_herb_fts_delete",
+    "DROP TRIGGER IF EXISTS index_herb_fts_insert",
+    "DROP TABLE IF EXISTS index_herb_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in FTS_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in FTS_DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0003_product_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Herb',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('scientific_name', models.CharField(db_index=True, max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('uses', models.TextField(blank=True)),
+                ('compounds', models.TextField(blank=True)),
+                ('preparation', models.TextField(blank=True)),
+                ('dosage', models.CharField(blank=True, max_length=100)),
+                ('side_effects', models.TextField(blank=True)),
+                ('interactions', models.TextField(blank=True)),
+                ('region', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# SQLite adds the column by rebuilding index_herb, which drops the FTS
+# triggers of migration 0004; the rows keep their ids, so the index stays
+# valid once the triggers are back
+herb_fts = import_module('index.migrations.0004_herb')
+TRIGGERS_SQL = [statement for statement in herb_fts.FTS_SQL if statement.startswith('CREATE TRIGGER')]
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in TRIGGERS_SQL:
+            schema_editor.execute(statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS', 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('index', '0004_herb'),
+    ]
+
+    operations = [
+        # Unapplying rebuilds the table again, before this runs
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        migrations.AddField(
+            model_name='herb',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
@@ -18,4 +18,22 @@ class Product(models.Model):
   image = models.FileField(upload_to='')
   
   def __str__(self):
-    return self.name
\ No newline at end of file
+    return self.name
+
+class Herb(models.Model):
+  """One row of the herbal dataset, loaded with ``manage.py import_herbs``."""
+  name = models.CharField(max_length=255)
+  scientific_name = models.CharField(max_length=255, db_index=True)
+  description = models.TextField(blank=True)
+  uses = models.TextField(blank=True)
+  compounds = models.TextField(blank=True)
+  preparation = models.TextField(blank=True)
+  dosage = models.CharField(max_length=100, blank=True)
+  side_effects = models.TextField(blank=True)
+  interactions = models.TextField(blank=True)
+  region = models.CharField(max_length=255, blank=True)
+  # Stamps the table's version, see herbal_db.table_version
+  updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+  def __str__(self):
+    return self.name
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ailixir.page_cache import invalidate
+from .models import Product, SocialHandle
+
+# Cached pages, see ailixir.page_cache
+
+@receiver(post_save, sender=SocialHandle)
+@receiver(post_delete, sender=SocialHandle)
+def invalidate_site_pages(sender, **kwargs):
+    # Every page lists the social handles
+    invalidate('site')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, **kwargs):
+    invalidate('products')
+
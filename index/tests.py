@@ -1,3 +1,862 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import json
+import math
+import os
+import random
+import string
+import tempfile
+import time
+import warnings
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ailixir.page_cache import is_shared
+
+from .management.commands.herbal_benchmark import legacy_scan
+from .models import Herb, Product, SocialHandle
+from .utils import herbal_analyzer, herbal_db, herbal_memory
+from .utils.herbal_fuzzy import TrigramIndex
+from .utils.herbal_analyzer import (
+    RANKINGS, build_herbal_index, get_herbal_index, query_cache, reload_herbal_database, search_herbs,
+    swap_herbal_index,
+)
+from .utils.herbal_cache import QueryCache
+from .utils.herbal_facets import FacetIndex, ids_from_bitmap
+from .utils.herbal_interactions import InteractionGraph
+from .utils.herbal_shards import ShardedIndex
+from .utils.herbal_suggest import MAX_SUGGESTIONS, SuggestionIndex
+from .utils.herbal_store import CompiledDataset, compile_dataset, compiled_path, open_compiled
+from .utils.herbal_synonyms import MAX_EXPANSION_WEIGHT
+from .utils.herbal_variants import collapse_variants
+from .utils.herbal_index import TOKEN_PATTERN, HerbalIndex, extract_keywords, searchable_text
+
+
+def synthetic_vocabulary(rows=100_000, terms=20_000, seed=7):
+    """Vocabulary of a synthetic herbal dataset with the given number of rows."""
+    rng = random.Random(seed)
+    words = [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+        for _ in range(terms)
+    ]
+    vocabulary = set()
+    for _ in range(rows):
+        text = f"{rng.choice(words)} variant, {rng.choice(words)}, {rng.choice(words)} {rng.choice(words)}"
+        vocabulary.update(TOKEN_PATTERN.findall(text))
+    return sorted(vocabulary)
+
+
+class HerbalIndexTests(SimpleTestCase):
+
+    QUERIES = ["pain", "malaria diabetes", "skin burns burns", "nausea after meals, poor digestion", "digest"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rows = build_herbal_index(collapse=False)
+
+    def test_substring_matches_the_legacy_scan(self):
+        # Duplicate keywords count twice, and ties keep dataset order
+        for query in self.QUERIES + ["fever, headache", "pain pain fever", "ache"]:
+            for limit in (1, 5, 20):
+                with self.subTest(query=query, limit=limit):
+                    found = search_herbs(query, limit, match="substring", index=self.rows)["results"]
+                    self.assertEqual(found, legacy_scan(self.rows.herbs, query, limit))
+
+    def test_token_mode_counts_whole_tokens(self):
+        def scan(query, limit):
+            keywords = set(extract_keywords(query))
+            results = []
+            for herb in self.rows.herbs:
+                score = len(keywords & set(TOKEN_PATTERN.findall(searchable_text(herb))))
+                if score:
+                    results.append({**herb, "score": score})
+            results.sort(key=lambda herb: herb["score"], reverse=True)
+            return results[:limit]
+
+        for query in self.QUERIES:
+            for limit in (1, 5, 20):
+                with self.subTest(query=query, limit=limit):
+                    found = search_herbs(query, limit, fuzzy=False, index=self.rows)["results"]
+                    self.assertEqual(found, scan(query, limit))
+
+
+class CollapseVariantsTests(SimpleTestCase):
+
+    def herb(self, name, scientific_name, **fields):
+        blank = dict.fromkeys(("description", "uses", "compounds", "preparation", "dosage",
+                               "side_effects", "interactions", "region"), "")
+        return {**blank, "name": name, "scientific_name": scientific_name, **fields}
+
+    def test_variants_fold_into_canonical_herbs(self):
+        herbs, variants = collapse_variants([
+            self.herb("Neem Variant-1", "Azadirachta indica", description="Malaria, Acne", dosage="2g/day", region="Asia"),
+            self.herb("Ginger", "Zingiber officinale", description="Nausea", dosage="1g/day"),
+            self.herb("Neem Variant-2", "Azadirachta indica", description="acne, Fever", dosage="3g/day", region="Africa"),
+            self.herb("Neem Variant-3", "Azadirachta indica", description="Malaria", dosage="3g/day", region="Asia"),
+        ])
+        self.assertEqual(variants, [("Neem Variant-1", "Neem Variant-2", "Neem Variant-3"), ("Ginger",)])
+        neem, ginger = herbs
+        self.assertEqual(neem["name"], "Neem")
+        # Values merged case-insensitively, first spelling and order kept
+        self.assertEqual(neem["description"], "Malaria, Acne, Fever")
+        self.assertEqual(neem["region"], "Asia, Africa")
+        self.assertEqual(neem["dosage"], "3g/day")
+        self.assertEqual((neem["variant_count"], ginger["variant_count"]), (3, 1))
+
+    def test_herbs_without_a_botanical_name(self):
+        herbs, variants = collapse_variants([
+            self.herb("Scent Leaf Variant-1", "N/A"),
+            self.herb("scent leaf Variant-2", "N/A"),
+            self.herb("Bitter Leaf", "N/A"),
+        ])
+        self.assertEqual([herb["name"] for herb in herbs], ["Scent Leaf", "Bitter Leaf"])
+        self.assertEqual(variants[0], ("Scent Leaf Variant-1", "scent leaf Variant-2"))
+
+    def test_none_known_gives_way_to_real_values(self):
+        herbs, _ = collapse_variants([
+            self.herb("Neem Variant-1", "Azadirachta indica", interactions="None known", side_effects="None known"),
+            self.herb("Neem Variant-2", "Azadirachta indica", interactions="Avoid with laxatives", side_effects="None known"),
+        ])
+        self.assertEqual(herbs[0]["interactions"], "Avoid with laxatives")
+        self.assertEqual(herbs[0]["side_effects"], "None known")
+
+
+class TermWeightMatrixTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        blank = dict.fromkeys(("scientific_name", "compounds", "preparation", "dosage",
+                               "side_effects", "interactions", "region"), "")
+        herbs = [
+            ("Alpha", "cough cough cough"),
+            ("Beta", "cough fever pain rash sore throat"),
+            ("Gamma", "fever"),
+            ("Delta", "fever pain"),
+            ("Epsilon", "malaria"),
+        ]
+        cls.index = HerbalIndex([{**blank, "name": name, "description": text, "uses": ""} for name, text in herbs])
+
+    def ranked(self, keywords, ranking):
+        found = self.index.rank(keywords, [], 5, ranking=ranking)["ranked"]
+        return [self.index.herbs[herb_id]["name"] for herb_id, _ in found]
+
+    def test_orderings(self):
+        expected = {
+            # Term frequency outranks a single mention
+            ("cough",): ["Alpha", "Beta"],
+            # Shorter herbs rank first
+            ("fever",): ["Gamma", "Delta", "Beta"],
+            ("cough", "fever"): ["Alpha", "Beta", "Gamma", "Delta"],
+            # A rare term outranks a common one
+            ("fever", "malaria"): ["Epsilon", "Gamma", "Delta", "Beta"],
+            ("fever", "pain"): ["Delta", "Beta", "Gamma"],
+        }
+        for ranking in ("bm25", "tfidf"):
+            for keywords, names in expected.items():
+                with self.subTest(ranking=ranking, keywords=keywords):
+                    self.assertEqual(self.ranked(list(keywords), ranking), names)
+
+    def test_bm25_weight(self):
+        # "fever" in Gamma: 2 tokens, average length 18 / 5, in 3 of 5 herbs
+        idf = math.log(1 + (5 - 3 + 0.5) / (3 + 0.5))
+        norm = 1.2 * (1 - 0.75 + 0.75 * 2 / (18 / 5))
+        scores = self.index.rankers["bm25"].score(["fever"])
+        self.assertAlmostEqual(scores[2], idf * 1 * 2.2 / (1 + norm))
+
+    def test_repeated_keywords_weigh_more(self):
+        for ranking in ("bm25", "tfidf"):
+            with self.subTest(ranking=ranking):
+                scores = self.index.rankers[ranking]
+                self.assertAlmostEqual(scores.score(["fever", "fever"])[2], 2 * scores.score(["fever"])[2])
+
+
+class ShardedIndexTests(SimpleTestCase):
+    """Scoring on shards gives exactly the results of the whole index."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rows = build_herbal_index(collapse=False)
+        cls.index = HerbalIndex(rows.herbs[:400], rows.synonym_weights)
+
+    def setUp(self):
+        self.sharded = ShardedIndex(self.index, 2)
+
+    def tearDown(self):
+        self.sharded.shutdown()
+
+    def test_results_and_facets_match(self):
+        self.assertEqual(len(self.sharded), 2)
+        queries = [
+            (["malaria", "cough"], [], "token", None),
+            (["pain"], [], "substring", None),
+            (["malaria"], [("high", "blood", "sugar")], "token", None),
+            (["skin", "infections"], [], "token", {"region": ["asia"]}),
+        ]
+        for keywords, phrases, match, filters in queries:
+            for ranking in RANKINGS:
+                with self.subTest(keywords=keywords, match=match, ranking=ranking, filters=filters):
+                    expected = self.index.rank(keywords, phrases, 10, match, ranking, filters)
+                    found = self.sharded.rank(keywords, phrases, 10, match, ranking, filters)
+                    self.assertTrue(expected["ranked"])
+                    self.assertEqual(found["ranked"], expected["ranked"])
+                    self.assertEqual(found["facets"], expected["facets"])
+
+
+class QueryCacheTests(SimpleTestCase):
+
+    def test_equivalent_queries_share_an_entry(self):
+        index = get_herbal_index()
+        search_herbs("fever, headache", index=index)
+        hits = query_cache.stats()["hits"]
+        for symptoms in ("headache fever", "Fever headache headache"):
+            search_herbs(symptoms, index=index)
+        self.assertEqual(query_cache.stats()["hits"], hits + 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        queries = QueryCache(maxsize=2)
+        queries.set("a", 1)
+        queries.set("b", 2)
+        queries.get("a")
+        queries.set("c", 3)
+        self.assertEqual((queries.get("a"), queries.get("b"), queries.get("c")), (1, None, 3))
+        self.assertEqual(queries.stats()["evictions"], 1)
+
+    def test_expired_entries_are_counted_apart(self):
+        queries = QueryCache(ttl=10)
+        with mock.patch("index.utils.herbal_cache.time.monotonic", return_value=100.0):
+            queries.set("a", 1)
+        with mock.patch("index.utils.herbal_cache.time.monotonic", return_value=105.0):
+            self.assertEqual(queries.get("a"), 1)
+        with mock.patch("index.utils.herbal_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(queries.get("a"))
+        stats = queries.stats()
+        self.assertEqual((stats["size"], stats["evictions"], stats["expirations"]), (0, 0, 1))
+
+    def test_swapping_the_index_retires_entries(self):
+        old = get_herbal_index()
+        self.addCleanup(swap_herbal_index, old)
+        search_herbs("fever, headache")
+        new = build_herbal_index()
+        swap_herbal_index(new)
+        self.assertEqual(query_cache.stats()["size"], 0)
+        self.assertNotEqual(new.generation, old.generation)
+        misses = query_cache.stats()["misses"]
+        search_herbs("fever, headache")
+        self.assertEqual(query_cache.stats()["misses"], misses + 1)
+
+
+class TrigramIndexTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.vocabulary = synthetic_vocabulary()
+        cls.index = TrigramIndex(cls.vocabulary)
+        rng = random.Random(11)
+        cls.words = rng.sample([word for word in cls.vocabulary if len(word) >= 7], 500)
+        cls.typos = [word[:3] + word[4:] for word in cls.words]
+
+    def test_corrects_dropped_letters(self):
+        corrected = sum(self.index.correct(typo) == word for typo, word in zip(self.typos, self.words))
+        self.assertGreaterEqual(corrected / len(self.words), 0.95)
+
+    def test_known_and_short_keywords(self):
+        self.assertEqual(self.index.correct(self.words[0]), self.words[0])
+        self.assertIsNone(self.index.correct("qzx"))
+
+    def test_correction_latency_is_sub_millisecond(self):
+        started = time.perf_counter()
+        for typo in self.typos:
+            self.index.correct(typo)
+        per_keyword = (time.perf_counter() - started) / len(self.typos)
+        self.assertLess(per_keyword, 0.001)
+
+
+class FacetIndexTests(SimpleTestCase):
+
+    def herb(self, region="", preparation="", compounds=""):
+        return {"region": region, "preparation": preparation, "compounds": compounds,
+                "side_effects": "", "interactions": ""}
+
+    def setUp(self):
+        self.facets = FacetIndex([
+            self.herb("Asia", "Tea", "Gingerol"),
+            self.herb("Asia, Africa", "Tea, Paste", "Nimbin"),
+            self.herb("Africa", "Powder", "Quercetin"),
+        ])
+
+    def herbs(self, filters):
+        return list(ids_from_bitmap(self.facets.mask(filters)))
+
+    def test_mask(self):
+        self.assertEqual(self.herbs({}), [0, 1, 2])
+        self.assertEqual(self.herbs({"region": ["africa"]}), [1, 2])
+        # Values of a facet are ORed, facets ANDed
+        self.assertEqual(self.herbs({"region": ["asia", " AFRICA "]}), [0, 1, 2])
+        self.assertEqual(self.herbs({"region": ["asia"], "form": ["paste", "powder"]}), [1])
+        self.assertEqual(self.herbs({"region": ["europe"]}), [])
+        self.assertEqual(self.herbs({"unknown": ["asia"]}), [])
+
+    def test_counts(self):
+        counts = self.facets.counts(self.facets.mask({"form": ["tea"]}))
+        self.assertEqual(counts["region"], {"Asia": 2, "Africa": 1})
+        self.assertEqual(list(counts["form"].items()), [("Tea", 2), ("Paste", 1)])
+        self.assertEqual(counts["compound"], {"Gingerol": 1, "Nimbin": 1})
+        self.assertEqual(counts["side_effect"], {})
+
+
+class HerbalFilterTests(SimpleTestCase):
+    """Facet filters of the recommendation API."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "herbs.csv"
+        path.write_text(HERBAL_CSV_HEADER + (
+            'Ginger,Zingiber officinale,Digestion,Gingerol,Tea,"Nausea, fever",1g/day,Heartburn,None known,Asia\n'
+            'Neem,Azadirachta indica,Skin care,Nimbin,"Tea, Paste",Fever,2g/day,None,None known,"Asia, Africa"\n'
+            'Moringa,Moringa oleifera,Nutrition,Quercetin,Powder,"Fever, anemia",5g/day,None,None known,Africa\n'
+        ), encoding="utf-8")
+        self.addCleanup(swap_herbal_index, get_herbal_index())
+        swap_herbal_index(build_herbal_index(path))
+
+    def get(self, query):
+        response = self.client.get(reverse("herbs") + "?symptoms=fever&" + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, query):
+        return sorted(herb["name"] for herb in self.get(query)["results"])
+
+    def test_filters(self):
+        self.assertEqual(self.names(""), ["Ginger", "Moringa", "Neem"])
+        self.assertEqual(self.names("region=Africa"), ["Moringa", "Neem"])
+        self.assertEqual(self.names("region=africa&region=asia"), ["Ginger", "Moringa", "Neem"])
+        self.assertEqual(self.names("region=Asia&form=paste"), ["Neem"])
+        self.assertEqual(self.names("region=Europe"), [])
+        self.assertEqual(self.get("form=powder")["facets"]["region"], {"Africa": 1})
+
+    def test_blank_values_filter_nothing(self):
+        unfiltered = self.get("")
+        self.assertEqual(self.get("region="), unfiltered)
+        self.assertEqual(self.get("region=+&compound="), unfiltered)
+        self.assertEqual(self.names("region=&form=powder"), ["Moringa"])
+        self.assertEqual(
+            search_herbs("fever", filters={"region": [" "], "form": ["powder"]})["results"][0]["name"], "Moringa",
+        )
+
+
+class AnonymousPageCacheTests(TestCase):
+    """The public pages are cached until what they show changes."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_are_cached(self):
+        for name in ('home', 'about', 'contact'):
+            with self.subTest(page=name):
+                self.client.get(reverse(name))
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_saves_invalidate(self):
+        self.client.get(reverse('home'))
+        Product.objects.create(name='Moringa Capsules', type='capsule', description='Daily', image='moringa.jpg')
+        self.assertContains(self.client.get(reverse('home')), 'Moringa Capsules')
+        self.client.get(reverse('about'))
+        SocialHandle.objects.create(name='Herbgram', url='https://herbgram.example.com', icon_class='instagram')
+        self.assertContains(self.client.get(reverse('about')), 'https://herbgram.example.com')
+
+    def test_saves_reach_other_workers(self):
+        # Another worker process, with its own client of the shared cache
+        other = caches.create_connection('default')
+        self.assertTrue(is_shared(other))
+        self.client.get(reverse('home'))
+        with mock.patch('ailixir.page_cache.cache', other):
+            Product.objects.create(name='Moringa Capsules', type='capsule', description='Daily', image='moringa.jpg')
+            # Its own pages are retired too
+            self.assertContains(self.client.get(reverse('home')), 'Moringa Capsules')
+        self.assertContains(self.client.get(reverse('home')), 'Moringa Capsules')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_not_cached_per_process(self):
+        self.client.get(reverse('home'))
+        Product.objects.bulk_create([Product(name='Moringa Capsules', type='capsule', description='Daily', image='m.jpg')])
+        self.assertContains(self.client.get(reverse('home')), 'Moringa Capsules')
+
+
+class HerbalPartialTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_keys_are_hashed(self):
+        url = reverse('herbs-partial')
+        symptoms = ', '.join(['fever', 'headache', 'persistent dry cough'] * 40)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            with mock.patch('index.views.cache', wraps=cache) as spy:
+                first = self.client.get(url, {'symptoms': symptoms})
+                second = self.client.get(url, {'symptoms': symptoms.upper()})
+        self.assertEqual(first.content, second.content)
+        keys = [call.args[0] for call in spy.set.call_args_list]
+        self.assertEqual(len(keys), 1)
+        self.assertLess(len(keys[0]), 250)
+
+
+HERBAL_CSV_HEADER = (
+    "Herb Name,Botanical Name,Common Uses,Active Compounds,Preparation Form,"
+    "Health Conditions Treated,Dosage,Side Effects,Interactions,Region Origin\n"
+)
+
+
+class DatabaseBackendTests(TestCase):
+    """HERBAL_BACKEND = "database": the Herb table kept in step by FTS5 triggers."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "herbs.csv"
+        self.path.write_text(HERBAL_CSV_HEADER + (
+            'Neem Variant-1,Azadirachta indica,Skin care,Nimbin,Tea,"Fever, malaria",2g/day,None,Avoid with diabetes drugs,Asia\n'
+            'Neem Variant-2,Azadirachta indica,Skin care,Nimbin,Tea,"Malaria, acne",2g/day,None,None known,Asia\n'
+            'Ginger,Zingiber officinale,Digestion,Gingerol,Tea,"Nausea, fever",1g/day,Heartburn,Enhances anticoagulants,Asia\n'
+        ), encoding="utf-8")
+        call_command("import_herbs", path=str(self.path), stdout=io.StringIO())
+        backend = mock.patch.object(herbal_analyzer, "HERBAL_BACKEND", "database")
+        backend.start()
+        self.addCleanup(backend.stop)
+        # Nothing here may load the CSV into memory
+        loader = mock.patch.object(herbal_analyzer, "get_herbal_index", side_effect=AssertionError)
+        loader.start()
+        self.addCleanup(loader.stop)
+
+    def names(self, symptoms, **options):
+        return [herb["name"] for herb in herbal_db.search_herbs(symptoms, collapse=False, **options)["results"]]
+
+    def test_triggers_follow_updates_and_deletes(self):
+        self.assertEqual(self.names("malaria"), ["Neem Variant-1", "Neem Variant-2"])
+        Herb.objects.filter(name="Ginger").update(description="Insomnia")
+        self.assertEqual((self.names("nausea"), self.names("insomnia")), ([], ["Ginger"]))
+        Herb.objects.filter(name="Neem Variant-1").delete()
+        self.assertEqual(self.names("malaria"), ["Neem Variant-2"])
+        call_command("import_herbs", path=str(self.path), replace=True, stdout=io.StringIO())
+        self.assertCountEqual(self.names("fever"), ["Neem Variant-1", "Ginger"])
+
+    def test_variants_are_collapsed(self):
+        results = search_herbs("malaria fever")["results"]
+        self.assertEqual([herb["name"] for herb in results], ["Neem", "Ginger"])
+
+    def test_features_without_the_index(self):
+        response = self.client.get(reverse("herbs-suggest"), {"prefix": "mal"})
+        self.assertEqual(response.json()["suggestions"][0]["term"].lower(), "malaria")
+        response = self.client.get(reverse("herbs-interactions"), {"items": "Neem,metformin"})
+        self.assertEqual(len(response.json()["conflicts"]), 1)
+        self.assertContains(self.client.get(reverse("herbs-partial"), {"symptoms": "nausea"}), "Ginger")
+
+    def test_changes_retire_cached_results(self):
+        url = reverse("herbs-partial")
+        self.assertNotContains(self.client.get(url, {"symptoms": "insomnia"}), "Ginger")
+        herb = Herb.objects.get(name="Ginger")
+        herb.description = "Insomnia"
+        herb.save()
+        self.assertContains(self.client.get(url, {"symptoms": "insomnia"}), "Ginger")
+        suggestions = self.client.get(reverse("herbs-suggest"), {"prefix": "ins"}).json()["suggestions"]
+        self.assertEqual([suggestion["term"].lower() for suggestion in suggestions], ["insomnia"])
+
+    def test_table_version_comes_from_the_table(self):
+        versions = [herbal_db.table_version()]
+        self.assertEqual(herbal_db.table_version(), versions[0])
+        # The import runs in a process of its own; what it changed in the
+        # table is all a worker can go by
+        self.path.write_text(HERBAL_CSV_HEADER + (
+            'Ginger,Zingiber officinale,Digestion,Gingerol,Tea,Insomnia,1g/day,Heartburn,None known,Asia\n'
+        ), encoding="utf-8")
+        url = reverse("herbs-partial")
+        self.assertNotContains(self.client.get(url, {"symptoms": "insomnia"}), "Ginger")
+        call_command("import_herbs", path=str(self.path), stdout=io.StringIO())
+        versions.append(herbal_db.table_version())
+        self.assertContains(self.client.get(url, {"symptoms": "insomnia"}), "Ginger")
+        Herb.objects.filter(name="Ginger").first().delete()
+        versions.append(herbal_db.table_version())
+        herb = Herb.objects.get(name="Neem Variant-1")
+        herb.save()
+        versions.append(herbal_db.table_version())
+        self.assertEqual(len(set(versions)), 4)
+
+
+class HerbalStoreTests(SimpleTestCase):
+    """The compiled dataset reads back the rows csv.DictReader would."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "herbs.csv"
+
+    def write(self, text):
+        self.path.write_text(text, encoding="utf-8")
+
+    def parsed(self):
+        with open(self.path, encoding="utf-8", newline="") as file:
+            return list(csv.DictReader(file))
+
+    def test_rows_match_the_csv(self):
+        self.write('Name,Uses,Region\nGinger,"Nausea, fever",Asia\nNeem,Skin,\nGinger,Tea,Asia\n\nAloe\n')
+        dataset = CompiledDataset(compile_dataset(self.path))
+        self.assertEqual(dataset.columns, ["Name", "Uses", "Region"])
+        self.assertEqual(len(dataset), 4)
+        self.assertEqual(list(dataset), [
+            {"Name": "Ginger", "Uses": "Nausea, fever", "Region": "Asia"},
+            {"Name": "Neem", "Uses": "Skin", "Region": ""},
+            {"Name": "Ginger", "Uses": "Tea", "Region": "Asia"},
+            # Short rows are padded with empty strings
+            {"Name": "Aloe", "Uses": "", "Region": ""},
+        ])
+        # Repeated values share one entry in the column's string table
+        self.assertEqual(dataset.strings("Name"), ["Ginger", "Neem", "Aloe"])
+        self.assertEqual(list(dataset.codes("Name")), [0, 1, 0, 2])
+
+    def test_blank_lines_are_not_rows(self):
+        self.write("A,B\n1,2\n\n3,4\n\n")
+        self.assertEqual(list(CompiledDataset(compile_dataset(self.path))), self.parsed())
+
+    def test_not_a_compiled_dataset(self):
+        compiled_path(self.path).write_bytes(b"A,B\n1,2\n")
+        with self.assertRaises(ValueError):
+            CompiledDataset(compiled_path(self.path))
+
+    def test_recompiled_when_the_csv_changes(self):
+        self.write("Name\nGinger\n")
+        self.assertEqual([row["Name"] for row in open_compiled(self.path)], ["Ginger"])
+        self.write("Name\nNeem\n")
+        self.assertEqual([row["Name"] for row in open_compiled(self.path)], ["Neem"])
+
+    def test_touched_csv_is_current_by_hash(self):
+        self.write("Name\nGinger\n")
+        dataset = CompiledDataset(compile_dataset(self.path))
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertTrue(dataset.is_current(self.path))
+        # Same size and a new mtime, but different content
+        self.write("Name\nAloes\n")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        self.assertFalse(dataset.is_current(self.path))
+        self.assertEqual([row["Name"] for row in open_compiled(self.path)], ["Aloes"])
+
+    def test_rows_are_parsed_when_it_cannot_compile(self):
+        self.write("Name,Region\nGinger,Asia\n")
+        with mock.patch.object(herbal_analyzer, "open_compiled", side_effect=PermissionError("read-only")), \
+                mock.patch("builtins.print"):
+            rows = list(herbal_analyzer.read_herbal_rows(self.path))
+        self.assertEqual(rows, [{"Name": "Ginger", "Region": "Asia"}])
+        self.assertFalse(compiled_path(self.path).exists())
+
+
+class HerbalReloadTests(SimpleTestCase):
+    """Editing the dataset swaps a new index in under readers of the old one."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "herbs.csv"
+        self.write('Ginger,Zingiber officinale,Digestion,Gingerol,Tea,"Nausea, fever",1g/day,Heartburn,None known,Asia\n')
+        self.addCleanup(swap_herbal_index, get_herbal_index())
+        dataset = mock.patch.object(herbal_analyzer, "HERBAL_DATASET_PATH", self.path)
+        dataset.start()
+        self.addCleanup(dataset.stop)
+        reload_herbal_database(wait=True)
+
+    def write(self, rows):
+        self.path.write_text(HERBAL_CSV_HEADER + rows, encoding="utf-8")
+
+    def names(self, symptoms, index=None):
+        return [herb["name"] for herb in search_herbs(symptoms, index=index)["results"]]
+
+    def test_reload_swaps_in_the_edited_dataset(self):
+        old = get_herbal_index()
+        self.assertEqual(self.names("nausea"), ["Ginger"])
+        self.write(
+            'Ginger,Zingiber officinale,Digestion,Gingerol,Tea,Insomnia,1g/day,Heartburn,None known,Asia\n'
+            'Neem,Azadirachta indica,Skin care,Nimbin,Tea,Nausea,2g/day,None,None known,Asia\n'
+        )
+        reload_herbal_database(wait=True)
+
+        new = get_herbal_index()
+        self.assertGreater(new.generation, old.generation)
+        self.assertEqual((self.names("nausea"), self.names("insomnia")), (["Neem"], ["Ginger"]))
+        # A request still holding the old index sees the old dataset whole
+        self.assertEqual(len(old.herbs), 1)
+        self.assertEqual(self.names("nausea", old), ["Ginger"])
+        self.assertEqual(self.names("insomnia", old), [])
+        self.assertEqual(old.suggestions.suggest("ins"), [])
+
+
+class HerbalBatchTests(SimpleTestCase):
+
+    def post(self, payload, **params):
+        url = reverse('herbs-batch')
+        if params:
+            url += '?' + '&'.join(f'{name}={value}' for name, value in params.items())
+        return self.client.post(url, payload, content_type='application/json')
+
+    def test_one_line_per_input_in_order(self):
+        symptoms = ["malaria", "", "cough, skin infections", "malaria"]
+        response = self.post(json.dumps(symptoms), ranking="bm25")
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line["symptoms"] for line in lines], symptoms)
+        for line in lines:
+            self.assertEqual(line["results"], search_herbs(line["symptoms"], ranking="bm25")["results"])
+        self.assertTrue(lines[0]["results"])
+        self.assertEqual(lines[1]["results"], [])
+
+    def test_invalid_payloads(self):
+        for payload in ('{', '{"symptoms": "cough"}', '["cough", 1]', '"cough"'):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+        self.assertEqual(self.post('["cough"]', ranking="nope").status_code, 400)
+        self.assertEqual(self.client.get(reverse('herbs-batch')).status_code, 405)
+
+    @override_settings(HERBAL_BATCH_MAX_SIZE=3)
+    def test_batch_size_is_capped(self):
+        self.assertEqual(self.post(json.dumps(["cough"] * 3)).status_code, 200)
+        response = self.post(json.dumps(["cough"] * 4))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'At most 3 symptom strings per batch'})
+
+
+class SuggestionIndexTests(SimpleTestCase):
+
+    def herb(self, description, uses, variant_count=1):
+        return {"description": description, "uses": uses, "variant_count": variant_count}
+
+    def setUp(self):
+        self.suggestions = SuggestionIndex([
+            self.herb("Fever, Skin infections", "Skin care", variant_count=3),
+            self.herb("Skin rash, fever", "Sleep"),
+            self.herb("Sleep", "Skin"),
+        ])
+
+    def terms(self, prefix, limit=8):
+        return [(suggestion["term"], suggestion["weight"]) for suggestion in self.suggestions.suggest(prefix, limit)]
+
+    def test_heaviest_first(self):
+        # Weighted by the rows carrying a term, ties in term order; words
+        # of a phrase are terms of their own
+        expected = [("skin", 5), ("Skin care", 3), ("Skin infections", 3), ("Sleep", 2), ("Skin rash", 1)]
+        self.assertEqual(self.terms("s"), expected)
+        self.assertEqual(self.terms(" S"), expected)
+        self.assertEqual(self.terms("s", 2), expected[:2])
+        self.assertEqual(self.terms("ski"), [term for term in expected if term[0].lower().startswith("ski")])
+        self.assertEqual(self.terms("fe"), [("Fever", 4)])
+        self.assertEqual(self.terms("x"), [])
+
+    def test_limit_is_clamped(self):
+        suggestions = SuggestionIndex([self.herb(", ".join(f"Sore {n}" for n in range(30)), "")])
+        self.assertEqual(len(suggestions.suggest("so", 100)), MAX_SUGGESTIONS)
+        self.assertEqual(len(suggestions.suggest("sore", 100)), MAX_SUGGESTIONS)
+        self.assertEqual(suggestions.suggest("so", 0), [])
+        self.assertEqual(suggestions.suggest("so", -1), [])
+        self.assertEqual(suggestions.suggest("", 5), [])
+
+
+class HerbalSuggestTests(SimpleTestCase):
+    """The autocomplete endpoint of the recommendation box."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "herbs.csv"
+        path.write_text(HERBAL_CSV_HEADER + (
+            'Neem,Azadirachta indica,Skin care,Nimbin,Tea,"Fever, Skin infections",2g/day,None,None known,Asia\n'
+            'Ginger,Zingiber officinale,Digestion,Gingerol,Tea,"Fever, Skin rash",1g/day,None,None known,Asia\n'
+            'Moringa,Moringa oleifera,Nutrition,Quercetin,Powder,"Sleep, Skin",5g/day,None,None known,Africa\n'
+        ), encoding="utf-8")
+        self.addCleanup(swap_herbal_index, get_herbal_index())
+        swap_herbal_index(build_herbal_index(path))
+
+    def get(self, prefix, **params):
+        return self.client.get(reverse("herbs-suggest"), {"prefix": prefix, **params})
+
+    def test_completes_the_last_fragment(self):
+        response = self.get("Fever, nausea, sk", limit=2)
+        self.assertEqual(response.json(), {
+            "prefix": "Fever, nausea, sk",
+            "suggestions": [{"term": "skin", "weight": 3}, {"term": "Skin care", "weight": 1}],
+        })
+        terms = [suggestion["term"] for suggestion in self.get("fe").json()["suggestions"]]
+        self.assertEqual(terms, ["Fever"])
+        self.assertEqual(self.get("fever,").json()["suggestions"], [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.get("s").json()["suggestions"]), 5)
+        self.assertEqual(len(self.get("s", limit=100).json()["suggestions"]), 5)
+        self.assertEqual(self.get("s", limit=-3).json()["suggestions"], [])
+        for limit in ("many", "2.5", ""):
+            with self.subTest(limit=limit):
+                response = self.get("s", limit=limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": "limit must be a number"})
+
+
+class InteractionGraphTests(SimpleTestCase):
+
+    def setUp(self):
+        self.graph = InteractionGraph()
+        herbs = [
+            ("Ginger", "Zingiber officinale", "Blood thinners, Diabetes drugs"),
+            ("Garlic", "Allium sativum", "Anticoagulants"),
+            ("Neem", "Azadirachta indica", "Diabetes drugs"),
+            ("Mint", "Mentha", "None known"),
+        ]
+        for name, scientific_name, interactions in herbs:
+            self.graph.add({"name": name, "scientific_name": scientific_name, "interactions": interactions})
+
+    def conflicts(self, items):
+        return [(c["type"], c["herb"], c["with"]) for c in self.graph.check(items)["conflicts"]]
+
+    def test_herbs_alone_do_not_conflict(self):
+        self.assertEqual(self.conflicts(["Ginger", "Neem", "Garlic", "Mint"]), [])
+
+    def test_drug_aliases(self):
+        for drug in ("warfarin", "Blood thinner", "aspirin", "anticoagulants"):
+            with self.subTest(drug=drug):
+                found = self.graph.check(["ginger", "Garlic", drug])
+                self.assertEqual(found["drug_classes"], ["anticoagulants"])
+                self.assertEqual(self.conflicts(["ginger", "Garlic", drug]), [
+                    ("herb-drug", "Ginger", "anticoagulants"),
+                    ("herb-drug", "Garlic", "anticoagulants"),
+                    ("herb-herb", "Ginger", "Garlic"),
+                ])
+
+    def test_shared_classes_outside_the_regimen(self):
+        # Ginger and Neem share diabetes drugs, which are not taken here
+        self.assertEqual(self.conflicts(["Ginger", "Neem", "warfarin"]), [("herb-drug", "Ginger", "anticoagulants")])
+
+    def test_scientific_names(self):
+        self.assertEqual(self.conflicts(["Azadirachta indica", "insulin"]), [("herb-drug", "Azadirachta indica", "diabetes drugs")])
+
+    def test_unknown_items(self):
+        found = self.graph.check(["Ginger", "unicorn dust", " ", "Metformin"])
+        self.assertEqual(found["herbs"], ["Ginger"])
+        self.assertEqual(found["unknown"], ["unicorn dust"])
+        self.assertEqual(found["drug_classes"], ["diabetes drugs"])
+
+    def test_empty_regimen(self):
+        self.assertEqual(self.graph.check([]), {"herbs": [], "drug_classes": [], "unknown": [], "conflicts": []})
+
+
+class SynonymExpansionTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = get_herbal_index()
+
+    def test_split(self):
+        phrases, rest = self.index.synonyms.split(["moringa", "high", "blood", "sugar", "high"])
+        self.assertEqual((phrases, rest), ([("high", "blood", "sugar")], ["moringa", "high"]))
+
+    def test_phrase_words_are_not_direct_hits(self):
+        # "blood" alone would match "High blood pressure"
+        for ranking in RANKINGS:
+            with self.subTest(ranking=ranking):
+                found = search_herbs("high blood sugar", ranking=ranking, index=self.index)["results"]
+                typed = search_herbs("diabetes", ranking=ranking, index=self.index)["results"]
+                self.assertTrue(found)
+                self.assertEqual([herb["name"] for herb in found], [herb["name"] for herb in typed])
+
+    def test_phrases_in_the_dataset_still_match_directly(self):
+        # "Blood pressure control" is among Hibiscus's uses
+        self.assertIn(("blood", "pressure"), self.index.synonyms.in_dataset)
+        for ranking in RANKINGS:
+            with self.subTest(ranking=ranking):
+                found = search_herbs("blood pressure", ranking=ranking, index=self.index)["results"]
+                expanded = search_herbs("hypertension", ranking=ranking, index=self.index)["results"]
+                self.assertEqual(found[0]["name"], "Hibiscus")
+                self.assertGreater(found[0]["score"], found[1]["score"])
+                hibiscus = next(herb for herb in expanded if herb["name"] == "Hibiscus")
+                self.assertGreater(found[0]["score"], hibiscus["score"] * MAX_EXPANSION_WEIGHT)
+
+    def test_single_word_phrases_in_the_dataset(self):
+        blank = dict.fromkeys(("scientific_name", "compounds", "preparation", "dosage",
+                               "side_effects", "interactions", "region"), "")
+        herbs = [
+            {**blank, "name": "Neem", "description": "Malaria", "uses": ""},
+            {**blank, "name": "Ginger", "description": "Fever", "uses": ""},
+        ]
+        index = HerbalIndex(herbs, {("fever",): [("malaria", 0.4)]})
+        index.generation = 0
+        self.assertEqual(index.synonyms.split(["fever"]), ([("fever",)], ["fever"]))
+        found = search_herbs("fever", index=index, fuzzy=False)["results"]
+        self.assertEqual([(herb["name"], herb["score"]) for herb in found], [("Ginger", 1), ("Neem", 0.4)])
+
+    def test_expansions_weigh_less_than_the_typed_term(self):
+        for ranking in RANKINGS:
+            with self.subTest(ranking=ranking):
+                typed = search_herbs("diabetes", ranking=ranking, index=self.index)["results"]
+                expanded = search_herbs("diabetic", ranking=ranking, index=self.index)["results"]
+                self.assertEqual([herb["name"] for herb in typed], [herb["name"] for herb in expanded])
+                for direct, expansion in zip(typed, expanded):
+                    self.assertLessEqual(expansion["score"], direct["score"] * MAX_EXPANSION_WEIGHT + 1e-4)
+
+
+SMAPS_ROLLUP = """\
+55d0c0a00000-7ffd5b9f5000 ---p 00000000 00:00 0                          [rollup]
+Rss:              204800 kB
+Pss:              102400 kB
+Pss_Anon:          51200 kB
+Shared_Clean:      81920 kB
+Shared_Dirty:      20480 kB
+Private_Clean:      2048 kB
+Private_Dirty:    100352 kB
+Referenced:       204800 kB
+Swap:                  0 kB
+"""
+
+
+class HerbalMemoryTests(SimpleTestCase):
+
+    def test_memory_usage_reads_smaps_rollup(self):
+        with mock.patch("builtins.open", mock.mock_open(read_data=SMAPS_ROLLUP)) as opened:
+            usage = herbal_memory.memory_usage(1234)
+        opened.assert_called_once_with("/proc/1234/smaps_rollup")
+        # Clean and dirty pages add up; fields not reported are skipped
+        self.assertEqual(usage, {"rss": 204800, "pss": 102400, "shared": 102400, "private": 102400})
+        self.assertEqual(herbal_memory.format_usage(usage), "rss=200.0MB pss=100.0MB shared=100.0MB private=100.0MB")
+
+    def test_memory_usage_without_proc(self):
+        with mock.patch("builtins.open", side_effect=FileNotFoundError), \
+                mock.patch.object(herbal_memory.resource, "getrusage") as getrusage:
+            getrusage.return_value.ru_maxrss = 4096
+            self.assertEqual(herbal_memory.memory_usage(), {"rss": 4096, "pss": 0, "shared": 0, "private": 0})
+            # Only this process has a fallback
+            with self.assertRaises(FileNotFoundError):
+                herbal_memory.memory_usage(1234)
+
+    def test_child_pids(self):
+        with mock.patch.object(Path, "read_text", return_value="101 102 \n"):
+            self.assertEqual(herbal_memory.child_pids(100), [101, 102])
+
+    def test_workers_log_after_their_first_request(self):
+        spec = importlib.util.spec_from_file_location("gunicorn_conf", settings.BASE_DIR / "gunicorn.conf.py")
+        conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(conf)
+        worker = mock.Mock(spec=["pid", "log"], pid=101)
+        with mock.patch.object(herbal_memory, "memory_usage", return_value={"rss": 2048}) as memory_usage:
+            for _ in range(3):
+                conf.post_request(worker, None, {}, None)
+        memory_usage.assert_called_once_with()
+        worker.log.info.assert_called_once_with("Worker %s after its first request: %s", 101, "rss=2.0MB")
@@ -1,5 +1,5 @@
 from django.urls import path
-from index.views import homepage, aboutpage, contactpage, contact_us, herbal_recommendation_api
+from index.views import homepage, aboutpage, contactpage, contact_us, herbal_recommendation_api, herbal_recommendation_partial, herbal_recommendation_batch_api, herbal_suggest_api, herbal_interactions_api, herbal_cache_stats_api
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -8,6 +8,11 @@ urlpatterns = [
     path('', homepage, name='home'),
     path('about-us/', aboutpage, name='about'),
     path('herbs-recom/', herbal_recommendation_api, name='herbs'),
+    path('herbs-recom/partial/', herbal_recommendation_partial, name='herbs-partial'),
+    path('herbs-recom/suggest/', herbal_suggest_api, name='herbs-suggest'),
+    path('herbs-recom/interactions/', herbal_interactions_api, name='herbs-interactions'),
+    path('herbs-recom/batch/', herbal_recommendation_batch_api, name='herbs-batch'),
+    path('herbs-recom/stats/', herbal_cache_stats_api, name='herbs-stats'),
     path('contact-us/', contactpage, name='contact'),
     path('contact-us/message/', contact_us, name='contact-us'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
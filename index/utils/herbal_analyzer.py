@@ -1,67 +1,394 @@
 import csv
-import re
+import gc
+import itertools
+import os
+import threading
+import time
 from pathlib import Path
 
+from django.conf import settings
+
+from . import herbal_db
+from .herbal_cache import QueryCache
+from .herbal_facets import FACETS
+from .herbal_index import HerbalIndex, extract_keywords
+from .herbal_interactions import InteractionGraph
+from .herbal_ranking import RANKINGS
+from .herbal_shards import ShardedIndex
+from .herbal_store import compiled_path, open_compiled
+from .herbal_synonyms import HERBAL_SYNONYMS_PATH, load_synonyms
+from .herbal_variants import collapse_variants
+
 # Path to your herbal dataset (update as needed)
 HERBAL_DATASET_PATH = Path("datasets/ailixir_herbal_dataset_10000.csv")
 
 # Cache the dataset in memory
 herbal_database = []
+# Inverted index over herbal_database, built alongside it. A reload builds
+# a complete new index and swaps this reference, so readers holding the
+# old one keep a consistent snapshot.
+herbal_index = None
 
+# Seconds between checks of the dataset files for changes, 0 disables
+HERBAL_RELOAD_INTERVAL = getattr(settings, 'HERBAL_RELOAD_INTERVAL', 5)
+# Fold "X Variant-N" rows into one canonical herb per botanical name
+HERBAL_COLLAPSE_VARIANTS = getattr(settings, 'HERBAL_COLLAPSE_VARIANTS', True)
+# Correct misspelt keywords to the closest dataset term by default
+HERBAL_FUZZY_MATCHING = getattr(settings, 'HERBAL_FUZZY_MATCHING', True)
+# "memory" scores the dataset in process, "database" queries the Herb
+# table through SQLite FTS5 (load it with manage.py import_herbs). Only
+# the memory backend offers the count and tfidf rankings (the database
+# always ranks by bm25), fuzzy corrections, synonym expansions, facet
+# counts, sharding and reloading on CSV edits
+HERBAL_BACKEND = getattr(settings, 'HERBAL_BACKEND', 'memory')
+# Worker processes scoring shards of the dataset in parallel, 0 or 1
+# scores every query in the serving process
+HERBAL_SHARD_WORKERS = getattr(settings, 'HERBAL_SHARD_WORKERS', 0)
+_generations = itertools.count(1)
+_load_lock = threading.Lock()
+_reload_thread = None
+_next_reload_check = 0.0
+_sharded_index = None
+_shard_lock = threading.Lock()
+
+MATCH_MODES = ("token", "substring")
+
+# Recent results keyed on the normalized query, cleared on every load
+query_cache = QueryCache(
+    maxsize=getattr(settings, 'HERBAL_QUERY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'HERBAL_QUERY_CACHE_TTL', 300),
+)
+
+
+def read_herbal_rows(path=HERBAL_DATASET_PATH):
+    """
+    Yields the dataset rows as dicts. Rows come from the memory-mapped
+    compiled form of the CSV, which is rebuilt whenever the CSV changes;
+    the CSV is parsed directly only if the compiled file cannot be written.
+    """
+    try:
+        yield from open_compiled(path)
+    except OSError as error:
+        print("⚠️ Could not use compiled dataset, parsing CSV:", error)
+        with open(path, mode='r', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+
+
+def _file_stamp(path):
+    """mtime and size of a file, None when it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _dataset_stamp(path):
+    return (_file_stamp(path), _file_stamp(compiled_path(path)), _file_stamp(HERBAL_SYNONYMS_PATH))
+
+
+def herb_from_row(row):
+    return {
+        "name": row.get("Common Name") or row.get("Herb Name") or "Unknown Herb",
+        #"local_name": row.get("Local Name (Hausa)") or row.get("Local Name") or "N/A",
+        "scientific_name": row.get("Botanical Name") or "N/A",
+        #"type": row.get("Type") or row.get("Category") or "General Herb",
+        "description": row.get("Health Conditions Treated") or "",
+        "uses": row.get("Common Uses") or "",
+        #"reason": row.get("Notes") or row.get("Recommendation") or "",
+        "compounds": row.get("Active Compounds") or "",
+        "preparation": row.get("Preparation Form") or "",
+        "dosage": row.get("Dosage") or "",
+        "side_effects": row.get("Side Effects") or "",
+        "interactions": row.get("Interactions") or "",
+        "region": row.get("Region Origin") or "",
+    }
 
-def load_herbal_database():
-    """Loads herbal dataset from CSV using only Python's csv module."""
-    global herbal_database
 
-    if herbal_database:  # already loaded
-        return herbal_database
+def build_herbal_index(path=None, collapse=None):
+    """
+    Reads the dataset and builds a new index without touching the live one.
 
+    With ``collapse`` (HERBAL_COLLAPSE_VARIANTS by default) rows sharing a
+    botanical name are folded into one canonical herb, which is what gets
+    indexed and scored; ``index.variants`` lists each one's variant names.
+    The herb/drug interaction graph, ``index.interactions``, is built from
+    the rows themselves as they stream past.
+    """
+    path = path or HERBAL_DATASET_PATH
+    if collapse is None:
+        collapse = HERBAL_COLLAPSE_VARIANTS
+    # The CSV is stamped before reading so an edit made meanwhile triggers
+    # another reload; the compiled file only exists once it has been read.
+    csv_stamp = _file_stamp(path)
+    synonyms_stamp = _file_stamp(HERBAL_SYNONYMS_PATH)
     herbs = []
-    if HERBAL_DATASET_PATH.exists():
-        with open(HERBAL_DATASET_PATH, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                herbs.append({
-                    "name": row.get("Common Name") or row.get("Herb Name") or "Unknown Herb",
-                    #"local_name": row.get("Local Name (Hausa)") or row.get("Local Name") or "N/A",
-                    "scientific_name": row.get("Botanical Name") or "N/A",
-                    #"type": row.get("Type") or row.get("Category") or "General Herb",
-                    "description": row.get("Health Conditions Treated") or "",
-                    "uses": row.get("Common Uses") or "",
-                    #"reason": row.get("Notes") or row.get("Recommendation") or "",
-                })
+    variants = None
+    interactions = InteractionGraph()
+    if path.exists():
+        rows = interactions.track(herb_from_row(row) for row in read_herbal_rows(path))
+        if collapse:
+            herbs, variants = collapse_variants(rows)
+        else:
+            herbs = list(rows)
     else:
-        print("⚠️ Dataset not found at:", HERBAL_DATASET_PATH)
+        print("⚠️ Dataset not found at:", path)
+
+    index = HerbalIndex(herbs, load_synonyms())
+    index.generation = next(_generations)
+    index.source_stamp = (csv_stamp, _file_stamp(compiled_path(path)), synonyms_stamp)
+    index.variants = variants
+    index.interactions = interactions
+    return index
+
+
+def swap_herbal_index(index):
+    """Atomically makes a fully built index the live one."""
+    global herbal_database, herbal_index
+    herbal_index = index
+    herbal_database = index.herbs
+    query_cache.clear()
+    if index.variants is None:
+        print(f"🌿 Loaded {len(index.herbs)} herbs into memory.")
+    else:
+        rows = sum(len(names) for names in index.variants)
+        print(f"🌿 Loaded {len(index.herbs)} herbs ({rows} variants) into memory.")
+
+
+def get_herbal_index():
+    """
+    Returns the live index, loading it on first use. Afterwards it checks
+    the dataset files every HERBAL_RELOAD_INTERVAL seconds and starts a
+    background reload when they changed; the caller is never blocked.
+    """
+    global _next_reload_check
+    index = herbal_index
+    if index is None:
+        with _load_lock:
+            if herbal_index is None:
+                swap_herbal_index(build_herbal_index())
+            return herbal_index
+
+    now = time.monotonic()
+    if HERBAL_RELOAD_INTERVAL and now >= _next_reload_check:
+        _next_reload_check = now + HERBAL_RELOAD_INTERVAL
+        if _dataset_stamp(HERBAL_DATASET_PATH) != index.source_stamp:
+            reload_herbal_database()
+    return index
+
+
+def get_sharded_index(index):
+    """
+    Returns the ShardedIndex over index when HERBAL_SHARD_WORKERS asks for
+    more than one worker, starting its worker pools on first use and
+    shutting down those of a previous index. Queries still holding a
+    replaced index are scored in process.
+    """
+    global _sharded_index
+    if HERBAL_SHARD_WORKERS <= 1 or index is not herbal_index:
+        return None
+    sharded = _sharded_index
+    if sharded is None or sharded.generation != index.generation:
+        with _shard_lock:
+            if _sharded_index is None or _sharded_index.generation != index.generation:
+                if _sharded_index is not None:
+                    _sharded_index.shutdown()
+                _sharded_index = ShardedIndex(index, HERBAL_SHARD_WORKERS)
+                _sharded_index.generation = index.generation
+            sharded = _sharded_index
+    return sharded
+
+
+def reload_herbal_database(wait=False):
+    """
+    Rebuilds the dataset and its indexes in a background thread and swaps
+    them in once complete. Requests keep using the previous index until
+    then. At most one reload runs at a time.
+    """
+    global _reload_thread
+    with _load_lock:
+        if _reload_thread is None or not _reload_thread.is_alive():
+            _reload_thread = threading.Thread(target=_reload, name="herbal-reload", daemon=True)
+            _reload_thread.start()
+        thread = _reload_thread
+    if wait:
+        thread.join()
+
+
+def _reload():
+    try:
+        swap_herbal_index(build_herbal_index())
+    except Exception as error:
+        print("⚠️ Herbal dataset reload failed, keeping the current one:", error)
 
-    herbal_database = herbs
-    print(f"🌿 Loaded {len(herbs)} herbs into memory.")
+
+def load_herbal_database():
+    """Loads herbal dataset from its compiled form, or the CSV as a fallback."""
+    return get_herbal_index().herbs
+
+
+def preload_herbal_database():
+    """
+    Loads the dataset and its indexes in the current process, meant to be
+    the gunicorn master, before workers are forked. Freezing the GC moves
+    the loaded objects out of the collector's reach, so the workers share
+    those pages copy-on-write instead of each writing its own copy.
+    """
+    herbs = load_herbal_database()
+    gc.collect()
+    gc.freeze()
     return herbs
 
 
-def analyze_herbal_symptoms(symptoms_text: str, limit: int = 5):
-    """Analyzes user symptoms dynamically and returns top herbs."""
+def analyze_herbal_symptoms(symptoms_text: str, limit: int = 5, match: str = "token",
+                            ranking: str = "count", filters=None, fuzzy=None):
+    """
+    Analyzes user symptoms dynamically and returns top herbs.
+
+    ``match="token"`` scores each herb by the number of distinct keywords
+    that appear as whole words in it. ``match="substring"`` is the
+    compatibility mode and reproduces the original per-keyword substring
+    scoring exactly, duplicate keywords and tie order included, when
+    HERBAL_COLLAPSE_VARIANTS is off; otherwise each canonical herb is
+    scored once, so results never repeat a species.
+
+    ``ranking="bm25"`` or ``ranking="tfidf"`` replaces the keyword count
+    with a relevance score from the precomputed term-weight matrix. These
+    rankings always match whole tokens.
+
+    ``filters`` maps facet names to accepted values, e.g.
+    ``{"region": ["Asia"], "form": ["tea"]}``.
+
+    ``fuzzy`` (HERBAL_FUZZY_MATCHING by default) replaces keywords missing
+    from the dataset vocabulary with their closest term by trigram
+    similarity, so "headach" matches "headache". It never applies in the
+    substring compatibility mode.
+    """
+    return search_herbs(symptoms_text, limit, match, ranking, filters, fuzzy)["results"]
+
+
+def search_herbs(symptoms_text: str, limit: int = 5, match: str = "token",
+                 ranking: str = "count", filters=None, fuzzy=None, index=None, lookups=None):
+    """
+    Like analyze_herbal_symptoms, but returns a dict holding the top
+    ``results``, the ``facets`` counts of every matching herb, the fuzzy
+    ``corrections`` applied to the keywords and the synonym
+    ``expansions`` that stood in for the phrases among them.
+
+    With HERBAL_BACKEND = "database" the query goes to
+    herbal_db.search_herbs instead, unless an ``index`` is given.
+    """
     if not symptoms_text.strip():
-        return []
+        return {"results": [], "facets": {}, "corrections": {}, "expansions": {}}
+    if index is None and HERBAL_BACKEND == "database":
+        return herbal_db.search_herbs(symptoms_text, limit, match, ranking, filters, fuzzy,
+                                      HERBAL_COLLAPSE_VARIANTS)
 
-    herbs = load_herbal_database()
-    symptoms = symptoms_text.lower()
-    keywords = re.findall(r'\b[a-z]+\b', symptoms)
-    results = []
-
-    for herb in herbs:
-        
-        # Create searchable text blob
-        searchable_text = " ".join([
-            herb["name"], herb["description"],
-            herb["uses"]
-        ]).lower()
-
-        # Score the herb by keyword match
-        score = sum(1 for kw in keywords if kw in searchable_text)
-
-        if score > 0:
-            results.append({**herb, "score": score})
-
-    # Sort and limit results
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:limit]
\ No newline at end of file
+    index = index or get_herbal_index()
+    keywords = extract_keywords(symptoms_text)
+    # Synonym phrases the dataset does not use ("high blood sugar") are
+    # scored through their weighted expansions alone: their words matched
+    # on their own would credit unrelated herbs ("High blood pressure")
+    # with a direct hit
+    phrases = []
+    if match != "substring":
+        phrases, keywords = index.synonyms.split(keywords)
+    corrections = {}
+    if match != "substring" and (HERBAL_FUZZY_MATCHING if fuzzy is None else fuzzy):
+        for keyword in set(keywords):
+            corrected = index.trigrams.correct(keyword)
+            if corrected and corrected != keyword:
+                corrections[keyword] = corrected
+        keywords = [corrections.get(keyword, keyword) for keyword in keywords]
+    # Keyword order never changes a score, so the sorted keywords are the
+    # cache key; duplicates only count in substring mode.
+    keywords = sorted(keywords if match == "substring" else set(keywords))
+    filters = {
+        facet: sorted({value.strip().lower() for value in values} - {""})
+        for facet, values in (filters or {}).items()
+    }
+    filters = {facet: values for facet, values in filters.items() if values}
+    phrases = sorted(set(phrases))
+    key = (index.generation, match, ranking, tuple(keywords), tuple(phrases), limit,
+           tuple((facet, tuple(values)) for facet, values in sorted(filters.items())))
+    cached = query_cache.get(key)
+    if cached is None:
+        cached = _rank_herbs(index, keywords, phrases, limit, match, ranking, filters, lookups)
+        query_cache.set(key, cached)
+    return {
+        "results": [dict(result) for result in cached["results"]],
+        "facets": {facet: dict(counts) for facet, counts in cached["facets"].items()},
+        "corrections": corrections,
+        "expansions": {" ".join(phrase): index.synonyms.expansions[phrase] for phrase in phrases},
+    }
+
+
+def suggest_herbal_terms(text: str, limit: int = 8):
+    """
+    Completes the last comma-separated fragment of text, e.g. "fever, sk"
+    -> "Skin infections", with the most frequent symptom and use terms.
+    """
+    if HERBAL_BACKEND == "database":
+        suggestions, _ = herbal_db.table_indexes()
+    else:
+        suggestions = get_herbal_index().suggestions
+    return suggestions.suggest(text.split(",")[-1], limit)
+
+
+def check_herbal_interactions(items):
+    """
+    Returns the conflicts within a regimen of herb names (variant, common
+    or botanical) and drug classes, e.g. ["Ginger", "warfarin"], looked up
+    in the interaction graph built with the index, or with the Herb table
+    when HERBAL_BACKEND = "database".
+    """
+    if HERBAL_BACKEND == "database":
+        _, interactions = herbal_db.table_indexes()
+    else:
+        interactions = get_herbal_index().interactions
+    return interactions.check(items)
+
+
+def herbal_data_version():
+    """
+    Identifies the herb data queries are answered from: the generation of
+    the live index, or the version of the Herb table on the database
+    backend. Caches of results key on it.
+    """
+    if HERBAL_BACKEND == "database":
+        return f"db{herbal_db.table_version()}"
+    return get_herbal_index().generation
+
+
+def analyze_herbal_batch(symptom_texts, limit: int = 5, match: str = "token",
+                         ranking: str = "count", filters=None, fuzzy=None):
+    """
+    Lazily yields the analyze_herbal_symptoms results for each text. The
+    herbs matching each keyword are looked up once for the whole batch,
+    and repeated queries are answered from the query cache. The whole
+    batch is answered from the index that was live when it started.
+    """
+    if HERBAL_BACKEND == "database":
+        for symptoms_text in symptom_texts:
+            yield search_herbs(symptoms_text, limit, match, ranking, filters, fuzzy)["results"]
+        return
+    index = get_herbal_index()
+    lookups = {}
+    for symptoms_text in symptom_texts:
+        yield search_herbs(symptoms_text, limit, match, ranking, filters, fuzzy, index, lookups)["results"]
+
+
+def _rank_herbs(index, keywords, phrases, limit, match, ranking, filters, lookups=None):
+    ranker = get_sharded_index(index) or index
+    try:
+        found = ranker.rank(keywords, phrases, limit, match, ranking, filters, lookups)
+    except RuntimeError:
+        # The shard pools were shut down by a reload mid-query
+        found = index.rank(keywords, phrases, limit, match, ranking, filters, lookups)
+    return {
+        "results": [
+            {**index.herbs[herb_id], "score": round(score, 4)}
+            for herb_id, score in found["ranked"]
+        ],
+        "facets": found["facets"],
+    }
@@ -0,0 +1,116 @@
+from django.db import connection
+from django.db.models import Count, Max
+
+from index.models import Herb
+
+from .herbal_facets import FACETS
+from .herbal_index import extract_keywords
+from .herbal_interactions import InteractionGraph
+from .herbal_suggest import SuggestionIndex
+from .herbal_variants import canonical_name
+
+# FTS5 table over Herb's name, description and uses, see migration 0004
+HERB_FTS_TABLE = "index_herb_fts"
+HERB_FIELDS = [field.name for field in Herb._meta.concrete_fields if field.name not in ("id", "updated_at")]
+
+# (table version, suggestion index, interaction graph) built from the table
+_table_indexes = None
+
+
+def fts_query(keywords, match="token"):
+    """
+    FTS5 query matching any keyword. Keywords are letters only, so quoting
+    is enough to keep words like "not" from being read as operators;
+    substring mode matches keywords as word prefixes.
+    """
+    suffix = "*" if match == "substring" else ""
+    return " OR ".join(f'"{keyword}"{suffix}' for keyword in dict.fromkeys(keywords))
+
+
+def table_version():
+    """
+    Version of the Herb table's contents, read from the table itself so
+    every process agrees on it, import_herbs included: the row count and
+    latest id change with inserts and deletes, the latest updated_at with
+    saves. Edits made with update() that leave updated_at alone are missed.
+    """
+    stamp = Herb.objects.aggregate(count=Count("id"), last=Max("id"), modified=Max("updated_at"))
+    modified = stamp["modified"]
+    return f"{stamp['count']}.{stamp['last']}.{modified.timestamp() if modified else 0}"
+
+
+def search_herbs(symptoms_text: str, limit: int = 5, match: str = "token",
+                 ranking: str = "count", filters=None, fuzzy=None, collapse=True):
+    """
+    The database counterpart of herbal_analyzer.search_herbs, with the same
+    arguments and result shape. Matching and ranking are done by SQLite
+    FTS5, whose bm25 score is used whatever the ``ranking``. With
+    ``collapse`` only the best ranked row of each botanical name is
+    returned, under its canonical name; otherwise each result is one Herb
+    row. Fuzzy corrections, synonym expansions and facet counts need the
+    in-memory index and are always empty here.
+    """
+    found = {"results": [], "facets": {}, "corrections": {}, "expansions": {}}
+    keywords = extract_keywords(symptoms_text)
+    if not keywords or limit <= 0:
+        return found
+
+    columns = ", ".join(f"h.{field}" for field in HERB_FIELDS)
+    where = [f"{HERB_FTS_TABLE} MATCH %s"]
+    params = [fts_query(keywords, match)]
+    # A herb passes a facet when any accepted value is one of its
+    # comma-separated values, compared case-insensitively
+    for facet, values in (filters or {}).items():
+        if facet not in FACETS or not values:
+            continue
+        field = FACETS[facet][0]
+        where.append("(" + " OR ".join(
+            f"',' || REPLACE(LOWER(h.{field}), ', ', ',') || ',' LIKE %s" for _ in values
+        ) + ")")
+        params.extend(f"%,{value.strip().lower()},%" for value in values)
+    sql = (
+        f"SELECT {columns}, bm25({HERB_FTS_TABLE}) AS rank"
+        f" FROM {HERB_FTS_TABLE} JOIN index_herb h ON h.id = {HERB_FTS_TABLE}.rowid"
+        f" WHERE {' AND '.join(where)}"
+        f" ORDER BY rank, h.id"
+    )
+    if not collapse:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    seen = set()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # Variants of a herb are skipped as the ranked rows stream past,
+        # grouped as herbal_variants.collapse_variants groups them
+        for row in cursor:
+            herb = dict(zip(HERB_FIELDS, row))
+            if collapse:
+                herb["name"] = canonical_name(herb["name"])
+                key = herb["scientific_name"] if herb["scientific_name"] != "N/A" else herb["name"].lower()
+                if key in seen:
+                    continue
+                seen.add(key)
+            # bm25() is lower for better matches
+            herb["score"] = round(-row[-1], 4)
+            found["results"].append(herb)
+            if len(found["results"]) == limit:
+                break
+    return found
+
+
+def table_indexes():
+    """
+    The suggestion index and interaction graph of the Herb table, built
+    from its rows on first use and again after each change to the table.
+    Each process builds and holds its own.
+    """
+    global _table_indexes
+    version = table_version()
+    built = _table_indexes
+    if built is None or built[0] != version:
+        interactions = InteractionGraph()
+        herbs = Herb.objects.values(*HERB_FIELDS).iterator(chunk_size=2000)
+        suggestions = SuggestionIndex(interactions.track(herbs))
+        built = _table_indexes = (version, suggestions, interactions)
+    return built[1], built[2]
@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+# Facet name -> (herb field, whether the field holds a comma-separated list).
+# Canonical herbs merge the values of all their variants into such a list.
+FACETS = {
+    "region": ("region", True),
+    "form": ("preparation", True),
+    "compound": ("compounds", True),
+    "side_effect": ("side_effects", True),
+    "interaction": ("interactions", True),
+}
+
+
+def facet_values(value, multiple):
+    """Splits a field into its normalized facet values."""
+    parts = value.split(",") if multiple else [value]
+    return [part.strip() for part in parts if part.strip()]
+
+
+def bitmap_from_ids(herb_ids, size):
+    """Packs herb ids into a bitmap held in a Python int, bit n set for id n."""
+    bits = bytearray((size + 7) // 8)
+    for herb_id in herb_ids:
+        bits[herb_id >> 3] |= 1 << (herb_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def ids_from_bitmap(bitmap):
+    """Yields the herb ids set in a bitmap, in ascending order."""
+    for offset, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            yield (offset << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+class FacetIndex:
+    """
+    One precomputed bitmap per facet value, so filtering herbs is a chain
+    of bitwise ANDs/ORs and counting them is a popcount.
+    """
+
+    def __init__(self, herbs):
+        self.size = len(herbs)
+        self.all = (1 << self.size) - 1
+        self.bitmaps = {}
+        self.labels = {}
+        for facet, (field, multiple) in FACETS.items():
+            herb_ids = defaultdict(list)
+            labels = {}
+            for herb_id, herb in enumerate(herbs):
+                for value in facet_values(herb[field], multiple):
+                    labels.setdefault(value.lower(), value)
+                    herb_ids[value.lower()].append(herb_id)
+            self.bitmaps[facet] = {
+                value: bitmap_from_ids(ids, self.size) for value, ids in herb_ids.items()
+            }
+            self.labels[facet] = labels
+
+    def mask(self, filters):
+        """
+        Returns the bitmap of herbs passing every facet filter. Values of
+        one facet are ORed together, different facets are ANDed.
+        """
+        mask = self.all
+        for facet, values in filters.items():
+            bitmaps = self.bitmaps.get(facet, {})
+            facet_mask = 0
+            for value in values:
+                facet_mask |= bitmaps.get(value.strip().lower(), 0)
+            mask &= facet_mask
+        return mask
+
+    def counts(self, mask):
+        """Counts the herbs in a bitmap for every facet value they carry."""
+        counts = {}
+        for facet, bitmaps in self.bitmaps.items():
+            labels = self.labels[facet]
+            facet_counts = {}
+            for value, bitmap in bitmaps.items():
+                count = (mask & bitmap).bit_count()
+                if count:
+                    facet_counts[labels[value]] = count
+            counts[facet] = dict(sorted(facet_counts.items(), key=lambda item: -item[1]))
+        return counts
@@ -0,0 +1,68 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+# Keywords shorter than this have too few trigrams to be corrected reliably
+MIN_FUZZY_LENGTH = 4
+
+
+def trigrams(term):
+    """Character trigrams of a term, padded so its start and end count more."""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Trigram -> term posting lists over the dataset vocabulary, used to
+    correct misspelt keywords ("headach", "malria") without comparing
+    them to every term. Term ids are assigned in order of term length, so
+    each posting list can be narrowed by bisection to the terms whose
+    length is close to the keyword's before any of them is scored.
+    """
+
+    def __init__(self, vocabulary, threshold=0.4, max_length_difference=2):
+        self.threshold = threshold
+        self.max_length_difference = max_length_difference
+        self.terms = sorted(vocabulary, key=len)
+        self.known = set(self.terms)
+        self.lengths = array('I', (len(term) for term in self.terms))
+        self.sizes = array('I')
+        postings = defaultdict(lambda: array('I'))
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(term_id)
+        self.postings = dict(postings)
+
+    def correct(self, keyword):
+        """
+        Returns the vocabulary term closest to keyword by trigram Jaccard
+        similarity, the keyword itself if it is known, or None.
+        """
+        if keyword in self.known:
+            return keyword
+        if len(keyword) < MIN_FUZZY_LENGTH:
+            return None
+
+        grams = trigrams(keyword)
+        first = bisect_left(self.lengths, len(keyword) - self.max_length_difference)
+        last = bisect_right(self.lengths, len(keyword) + self.max_length_difference)
+        shared = defaultdict(int)
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            for term_id in posting[bisect_left(posting, first):bisect_left(posting, last)]:
+                shared[term_id] += 1
+
+        # Ties go to the closest length, then to the first term in order
+        best = None
+        best_key = (self.threshold,)
+        for term_id, count in shared.items():
+            score = count / (len(grams) + self.sizes[term_id] - count)
+            key = (score, -abs(self.lengths[term_id] - len(keyword)), -term_id)
+            if key >= best_key:
+                best, best_key = term_id, key
+        return None if best is None else self.terms[best]
@@ -0,0 +1,182 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+
+from .herbal_facets import FacetIndex, bitmap_from_ids, ids_from_bitmap
+from .herbal_fuzzy import TrigramIndex
+from .herbal_ranking import TermWeightMatrix
+from .herbal_suggest import SuggestionIndex
+from .herbal_synonyms import SynonymTable
+
+# Every maximal run of letters in a herb's searchable text is a token.
+TOKEN_PATTERN = re.compile(r'[a-z]+')
+# Query keywords are extracted exactly as analyze_herbal_symptoms always did.
+KEYWORD_PATTERN = re.compile(r'\b[a-z]+\b')
+
+
+def searchable_text(herb):
+    """Returns the lowercased text blob a herb is matched against."""
+    return " ".join([
+        herb["name"], herb["description"],
+        herb["uses"]
+    ]).lower()
+
+
+def extract_keywords(text):
+    """Splits user input into lowercase keywords."""
+    return KEYWORD_PATTERN.findall(text.lower())
+
+
+class HerbalIndex:
+    """
+    Inverted index mapping each token to the sorted ids of the herbs that
+    contain it, so a query only touches herbs sharing a term with it.
+
+    An index over one shard of a larger dataset is given the ``corpus``
+    statistics of the whole dataset (see corpus_stats), so its BM25 and
+    TF-IDF weights equal those of the full index. Shards skip the trigram
+    and suggestion indexes, which only the full index serves.
+    """
+
+    def __init__(self, herbs, synonyms=None, corpus=None):
+        self.herbs = herbs
+        postings = defaultdict(list)
+        frequencies = defaultdict(list)
+        self.lengths = []
+        # Variants share most field values, so each distinct value is
+        # tokenized once. Fields never share a token across the space
+        # that joins them, so this equals tokenizing searchable_text.
+        field_tokens = {}
+        for herb_id, herb in enumerate(herbs):
+            tokens = []
+            for value in (herb["name"], herb["description"], herb["uses"]):
+                if value not in field_tokens:
+                    field_tokens[value] = TOKEN_PATTERN.findall(value.lower())
+                tokens += field_tokens[value]
+            self.lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                postings[token].append(herb_id)
+                frequencies[token].append(count)
+        self.postings = dict(postings)
+        # Term frequencies, parallel to each posting list
+        self.frequencies = dict(frequencies)
+        self.vocabulary = sorted(self.postings)
+        self.term_bitmaps = {
+            term: bitmap_from_ids(herb_ids, len(herbs))
+            for term, herb_ids in self.postings.items()
+        }
+        self.facets = FacetIndex(herbs)
+        if corpus is None:
+            self.trigrams = TrigramIndex(self.vocabulary)
+            self.suggestions = SuggestionIndex(herbs)
+        self.corpus = corpus or self.corpus_stats()
+        self.rankers = {
+            "bm25": TermWeightMatrix.bm25(self),
+            "tfidf": TermWeightMatrix.tfidf(self),
+        }
+        self.synonym_weights = synonyms or {}
+        self.synonyms = SynonymTable(self.synonym_weights, self)
+
+    def contains_phrase(self, words):
+        """Whether some herb's name, description or uses holds the words in a row."""
+        words = list(words)
+        herb_ids = set(self.postings.get(words[0], ()))
+        for word in words[1:]:
+            herb_ids &= set(self.postings.get(word, ()))
+        if len(words) == 1:
+            return bool(herb_ids)
+        width = len(words)
+        for herb_id in herb_ids:
+            herb = self.herbs[herb_id]
+            for value in (herb["name"], herb["description"], herb["uses"]):
+                tokens = TOKEN_PATTERN.findall(value.lower())
+                if any(tokens[start:start + width] == words for start in range(len(tokens) - width + 1)):
+                    return True
+        return False
+
+    def corpus_stats(self):
+        """Herb count, average herb length and document frequencies."""
+        total = len(self.lengths)
+        return {
+            "total": total,
+            "average_length": sum(self.lengths) / total if total else 0.0,
+            "df": {term: len(herb_ids) for term, herb_ids in self.postings.items()},
+        }
+
+    def lookup(self, keyword, match="token"):
+        """
+        Returns the ids of herbs matching a keyword.
+
+        ``match="token"`` requires a whole-token match. ``match="substring"``
+        reproduces the original ``keyword in searchable_text`` test: a
+        letters-only keyword can only occur inside a single token, so the
+        union of postings of every vocabulary term containing it is exact.
+        """
+        if match == "substring":
+            herb_ids = set()
+            for term in self.vocabulary:
+                if keyword in term:
+                    herb_ids.update(self.postings[term])
+            return herb_ids
+        return self.postings.get(keyword, ())
+
+    def matched_bitmap(self, keywords, match="token"):
+        """Bitmap of the herbs matching any of the keywords."""
+        bitmap = 0
+        for keyword in keywords:
+            if match == "substring":
+                for term in self.vocabulary:
+                    if keyword in term:
+                        bitmap |= self.term_bitmaps[term]
+            else:
+                bitmap |= self.term_bitmaps.get(keyword, 0)
+        return bitmap
+
+    def score(self, keywords, match="token", lookups=None):
+        """
+        Counts, per herb id, how many of the keywords it matches. Passing
+        the same ``lookups`` dict to several calls shares keyword lookups
+        between them.
+        """
+        if lookups is None:
+            lookups = {}
+        scores = defaultdict(int)
+        for keyword in keywords:
+            if (match, keyword) not in lookups:
+                lookups[match, keyword] = self.lookup(keyword, match)
+            for herb_id in lookups[match, keyword]:
+                scores[herb_id] += 1
+        return scores
+
+    def rank(self, keywords, phrases, limit, match="token", ranking="count", filters=None, lookups=None):
+        """
+        Scores the herbs matching the keywords and synonym phrases, and
+        returns the ``ranked`` top (herb id, score) pairs, best first,
+        with the ``facets`` counts of every herb that matched.
+        """
+        # Only herbs sharing a term with the query are ever touched
+        if ranking in self.rankers:
+            scores = self.rankers[ranking].score(keywords)
+        else:
+            scores = self.score(keywords, match, lookups)
+
+        # Facet filtering and counting are bitwise operations on the bitmap
+        # of matching herbs
+        matched = self.matched_bitmap(keywords, "token" if ranking in self.rankers else match)
+
+        # Each synonym phrase is one lookup into its precompiled expansion table
+        table = self.synonyms.tables["count" if ranking not in self.rankers else ranking]
+        for phrase in phrases:
+            for herb_id, weight in table[phrase].items():
+                scores[herb_id] += weight
+            matched |= self.synonyms.bitmaps[phrase]
+        if filters:
+            matched &= self.facets.mask(filters)
+            scores = {herb_id: scores[herb_id] for herb_id in ids_from_bitmap(matched)}
+
+        # Common words match thousands of herbs, so select the top ones with a
+        # heap instead of sorting them all; ties keep dataset order
+        return {
+            "ranked": heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0])),
+            "facets": self.facets.counts(matched),
+        }
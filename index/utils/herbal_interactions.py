@@ -0,0 +1,116 @@
+import re
+from collections import defaultdict
+from itertools import combinations
+
+from .herbal_variants import canonical_name
+
+# "Avoid with laxatives" -> "laxatives"
+INTERACTION_PREFIX = re.compile(r'^(?:enhances|may interact with|interacts with|avoid with)\s+', re.IGNORECASE)
+NO_INTERACTION = "none known"
+
+# Names users may type for the drug classes the dataset mentions
+DRUG_CLASS_ALIASES = {
+    "blood thinners": "anticoagulants",
+    "blood thinner": "anticoagulants",
+    "anticoagulant": "anticoagulants",
+    "warfarin": "anticoagulants",
+    "heparin": "anticoagulants",
+    "aspirin": "anticoagulants",
+    "diabetes drug": "diabetes drugs",
+    "antidiabetics": "diabetes drugs",
+    "metformin": "diabetes drugs",
+    "insulin": "diabetes drugs",
+    "laxative": "laxatives",
+}
+
+
+def drug_class(text):
+    """Normalizes a drug class, or the tail of an interaction note, to its key."""
+    text = INTERACTION_PREFIX.sub("", text.strip()).lower()
+    return DRUG_CLASS_ALIASES.get(text, text)
+
+
+class InteractionGraph:
+    """
+    Adjacency index between herbs and the drug classes their Interactions
+    column warns about, built row by row while the dataset streams in.
+    Each herb is reachable by its variant, canonical and botanical names;
+    a canonical name carries the interactions of all its variants. A
+    conflict check is then a set intersection per herb.
+    """
+
+    def __init__(self):
+        # herb key -> {drug class: interaction note}
+        self.edges = defaultdict(dict)
+        self.labels = {}
+        self.drug_classes = set()
+
+    def add(self, herb):
+        notes = [note.strip() for note in herb["interactions"].split(",")]
+        names = (herb["name"], canonical_name(herb["name"]), herb["scientific_name"])
+        for name in names:
+            if name and name != "N/A":
+                self.labels.setdefault(name.lower(), name)
+        for note in notes:
+            if not note or note.lower() == NO_INTERACTION:
+                continue
+            target = drug_class(note)
+            self.drug_classes.add(target)
+            for name in names:
+                if name and name != "N/A":
+                    self.edges[name.lower()].setdefault(target, note)
+        return herb
+
+    def track(self, herbs):
+        """Adds herbs to the graph as they pass through, yielding them on."""
+        for herb in herbs:
+            yield self.add(herb)
+
+    def check(self, items):
+        """
+        Returns the conflicts among a regimen of herbs and drug classes:
+        a herb whose interactions name a drug class in the regimen, and
+        two herbs that both interact with a drug class in the regimen,
+        whose effects on it compound.
+        """
+        herbs, classes, unknown = [], [], []
+        for item in items:
+            key = item.strip().lower()
+            if not key:
+                continue
+            if key in self.labels:
+                herbs.append(key)
+            elif drug_class(key) in self.drug_classes:
+                classes.append(drug_class(key))
+            else:
+                unknown.append(item.strip())
+        herbs = list(dict.fromkeys(herbs))
+        classes = list(dict.fromkeys(classes))
+
+        conflicts = []
+        regimen_classes = set(classes)
+        for herb in herbs:
+            edges = self.edges.get(herb, {})
+            for target in sorted(edges.keys() & regimen_classes):
+                conflicts.append({
+                    "type": "herb-drug",
+                    "herb": self.labels[herb],
+                    "with": target,
+                    "interaction": edges[target],
+                })
+        for first, second in combinations(herbs, 2):
+            shared = self.edges.get(first, {}).keys() & self.edges.get(second, {}).keys() & regimen_classes
+            for target in sorted(shared):
+                conflicts.append({
+                    "type": "herb-herb",
+                    "herb": self.labels[first],
+                    "with": self.labels[second],
+                    "interaction": f"Both interact with {target}",
+                })
+
+        return {
+            "herbs": [self.labels[herb] for herb in herbs],
+            "drug_classes": classes,
+            "unknown": unknown,
+            "conflicts": conflicts,
+        }
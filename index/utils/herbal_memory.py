@@ -0,0 +1,45 @@
+import os
+import resource
+from pathlib import Path
+
+# Fields of /proc/<pid>/smaps_rollup that are reported, in kB
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+
+def memory_usage(pid="self"):
+    """
+    Returns the rss, pss, shared and private memory of a process in kB.
+
+    PSS splits every shared page between the processes mapping it, so
+    summing it over gunicorn workers gives their real combined footprint.
+    Outside Linux only the peak RSS of the current process is available.
+    """
+    usage = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            for line in file:
+                field, _, value = line.partition(":")
+                if field in MEMORY_FIELDS:
+                    usage[MEMORY_FIELDS[field]] += int(value.split()[0])
+    except OSError:
+        if pid not in ("self", os.getpid()):
+            raise
+        usage["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def child_pids(pid):
+    """Returns the pids of a process's children, e.g. a gunicorn master's workers."""
+    children = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(child) for child in children.read_text().split()]
+
+
+def format_usage(usage):
+    return " ".join(f"{field}={value / 1024:.1f}MB" for field, value in usage.items())
@@ -0,0 +1,80 @@
+import math
+from array import array
+from collections import Counter, defaultdict
+
+RANKINGS = ("count", "bm25", "tfidf")
+
+
+class TermWeightMatrix:
+    """
+    Sparse herb x term weight matrix, stored column-wise: each term owns a
+    pair of parallel arrays holding the ids of the herbs containing it and
+    its precomputed weight in each of them. Scoring a query multiplies the
+    matrix by the query's term vector one column at a time, a Python loop
+    over the postings of the query terms only.
+    """
+
+    def __init__(self, columns, query_weights):
+        self.columns = columns
+        self.query_weights = query_weights
+
+    @classmethod
+    def bm25(cls, index, k1=1.2, b=0.75):
+        """Okapi BM25 weights, with the usual k1/b length normalisation."""
+        total = index.corpus["total"]
+        average_length = index.corpus["average_length"]
+        columns = {}
+        query_weights = {}
+        for term, herb_ids in index.postings.items():
+            df = index.corpus["df"][term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            weights = array('d')
+            for herb_id, tf in zip(herb_ids, index.frequencies[term]):
+                norm = k1 * (1 - b + b * index.lengths[herb_id] / average_length)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            columns[term] = (array('I', herb_ids), weights)
+            query_weights[term] = 1.0
+        return cls(columns, query_weights)
+
+    @classmethod
+    def tfidf(cls, index):
+        """Log-scaled TF-IDF weights with each herb vector L2-normalised."""
+        total = index.corpus["total"]
+        idfs = {
+            term: math.log(total / index.corpus["df"][term]) + 1
+            for term in index.postings
+        }
+        raw = {}
+        norms = defaultdict(float)
+        # Summed in vocabulary order, so a herb's norm is bit-for-bit the
+        # same in any index holding it, including a shard
+        for term in index.vocabulary:
+            herb_ids = index.postings[term]
+            weights = array('d', (
+                (1 + math.log(tf)) * idfs[term] for tf in index.frequencies[term]
+            ))
+            for herb_id, weight in zip(herb_ids, weights):
+                norms[herb_id] += weight * weight
+            raw[term] = (array('I', herb_ids), weights)
+        columns = {}
+        for term, (herb_ids, weights) in raw.items():
+            columns[term] = (herb_ids, array('d', (
+                weight / math.sqrt(norms[herb_id])
+                for herb_id, weight in zip(herb_ids, weights)
+            )))
+        return cls(columns, idfs)
+
+    def score(self, keywords):
+        """
+        Sums the weighted columns of the query terms into {herb id: score},
+        which is the product of the matrix and the query's term vector.
+        """
+        scores = defaultdict(float)
+        for term, count in Counter(keywords).items():
+            column = self.columns.get(term)
+            if column is None:
+                continue
+            query_weight = self.query_weights[term] * count
+            for herb_id, weight in zip(*column):
+                scores[herb_id] += query_weight * weight
+        return scores
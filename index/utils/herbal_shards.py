@@ -0,0 +1,85 @@
+import heapq
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .herbal_index import HerbalIndex
+
+# The shard owned by the current worker process, and its first herb id
+_shard = None
+_offset = 0
+
+
+def _load_shard(herbs, synonyms, corpus, offset):
+    global _shard, _offset
+    _shard = HerbalIndex(herbs, synonyms, corpus)
+    _offset = offset
+
+
+def _rank_shard(keywords, phrases, limit, match, ranking, filters):
+    found = _shard.rank(keywords, phrases, limit, match, ranking, filters)
+    found["ranked"] = [(_offset + herb_id, score) for herb_id, score in found["ranked"]]
+    # Labels are keyed by value, the parent restores their dataset spelling
+    found["facets"] = {
+        facet: {label.lower(): count for label, count in counts.items()}
+        for facet, counts in found["facets"].items()
+    }
+    return found
+
+
+class ShardedIndex:
+    """
+    Splits the herbs of an index into contiguous shards, each indexed by
+    its own single-process pool, so one query is scored on all shards in
+    parallel. Shards are weighted with the statistics of the whole
+    dataset and report global herb ids, so merging their top results
+    gives exactly the ranking of the unsharded index.
+
+    Workers are spawned rather than forked, which is safe from the
+    threaded server, and start building their shard straight away.
+    """
+
+    def __init__(self, index, workers):
+        size = math.ceil(len(index.herbs) / workers) or 1
+        context = multiprocessing.get_context("spawn")
+        self.labels = index.facets.labels
+        self.pools = []
+        for offset in range(0, len(index.herbs), size):
+            pool = ProcessPoolExecutor(
+                max_workers=1, mp_context=context, initializer=_load_shard,
+                initargs=(index.herbs[offset:offset + size], index.synonym_weights, index.corpus, offset),
+            )
+            pool.submit(int)
+            self.pools.append(pool)
+
+    def __len__(self):
+        return len(self.pools)
+
+    def rank(self, keywords, phrases, limit, match="token", ranking="count", filters=None, lookups=None):
+        """Same as HerbalIndex.rank, scored on every shard at once."""
+        futures = [
+            pool.submit(_rank_shard, keywords, phrases, limit, match, ranking, filters)
+            for pool in self.pools
+        ]
+        parts = [future.result() for future in futures]
+        facets = {}
+        for part in parts:
+            for facet, counts in part["facets"].items():
+                merged = facets.setdefault(facet, {})
+                for value, count in counts.items():
+                    label = self.labels[facet][value]
+                    merged[label] = merged.get(label, 0) + count
+        return {
+            "ranked": heapq.nsmallest(
+                limit, (item for part in parts for item in part["ranked"]),
+                key=lambda item: (-item[1], item[0]),
+            ),
+            "facets": {
+                facet: dict(sorted(counts.items(), key=lambda item: -item[1]))
+                for facet, counts in facets.items()
+            },
+        }
+
+    def shutdown(self):
+        for pool in self.pools:
+            pool.shutdown(wait=False, cancel_futures=True)
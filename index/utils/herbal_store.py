@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+MAGIC = b'AHDB'
+VERSION = 1
+# magic, version, source mtime_ns, source size, source sha256, rows,
+# directory offset, directory length
+HEADER = struct.Struct('<4sHxxqq32sIQI')
+
+
+def compiled_path(csv_path):
+    """Returns where the compiled form of a CSV dataset lives."""
+    return Path(csv_path).with_suffix('.hdb')
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _align(file):
+    file.write(b'\0' * (-file.tell() % 4))
+    return file.tell()
+
+
+def compile_dataset(csv_path, out_path=None):
+    """
+    Compiles a CSV dataset into a columnar binary file: for each column a
+    table of its distinct strings plus one uint32 code per row. The file
+    is written to a temporary name and swapped in atomically, so workers
+    compiling concurrently never observe a partial file.
+    """
+    csv_path = Path(csv_path)
+    out_path = Path(out_path or compiled_path(csv_path))
+    stat = os.stat(csv_path)
+
+    with open(csv_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        names = next(reader, [])
+        tables = [{} for _ in names]
+        codes = [array('I') for _ in names]
+        rows = 0
+        for row in reader:
+            # Blank lines, which csv.DictReader skips too
+            if not row:
+                continue
+            row += [''] * (len(names) - len(row))
+            for table, column, value in zip(tables, codes, row):
+                column.append(table.setdefault(value, len(table)))
+            rows += 1
+
+    fd, tmp_path = tempfile.mkstemp(dir=out_path.parent, prefix=out_path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(b'\0' * HEADER.size)
+            entries = []
+            for name, table, column in zip(names, tables, codes):
+                blob = bytearray()
+                offsets = array('I', [0])
+                for value in table:
+                    blob += value.encode('utf-8')
+                    offsets.append(len(blob))
+                entry = {'name': name, 'count': len(table)}
+                entry['offsets'] = _align(out)
+                offsets.tofile(out)
+                entry['codes'] = _align(out)
+                column.tofile(out)
+                entry['blob'] = out.tell()
+                entry['blob_length'] = len(blob)
+                out.write(blob)
+                entries.append(entry)
+
+            # The column directory goes last, the fixed header points at it
+            directory = json.dumps({'byteorder': sys.byteorder, 'columns': entries}).encode('utf-8')
+            directory_offset = out.tell()
+            out.write(directory)
+            out.seek(0)
+            out.write(HEADER.pack(
+                MAGIC, VERSION, stat.st_mtime_ns, stat.st_size, _file_digest(csv_path),
+                rows, directory_offset, len(directory),
+            ))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return out_path
+
+
+class CompiledDataset:
+    """
+    Read-only, memory-mapped view of a compiled dataset. Row codes stay in
+    the mapping; each column's string table is decoded once on first use,
+    so rows that repeat a value share a single string object.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.source_mtime_ns, self.source_size,
+             self.source_sha256, self.rows, directory_offset,
+             directory_length) = HEADER.unpack_from(self._map)
+        except struct.error:
+            raise ValueError(f"{self.path} is not a compiled herbal dataset")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a compiled herbal dataset")
+        directory = json.loads(self._map[directory_offset:directory_offset + directory_length])
+        if directory['byteorder'] != sys.byteorder:
+            raise ValueError(f"{self.path} was compiled on a {directory['byteorder']}-endian machine")
+        self._columns = {entry['name']: entry for entry in directory['columns']}
+        self._strings = {}
+        self._view = memoryview(self._map)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def __len__(self):
+        return self.rows
+
+    def is_current(self, csv_path):
+        """True when the CSV has not changed since it was compiled."""
+        stat = os.stat(csv_path)
+        if (stat.st_mtime_ns, stat.st_size) == (self.source_mtime_ns, self.source_size):
+            return True
+        return stat.st_size == self.source_size and _file_digest(csv_path) == self.source_sha256
+
+    def codes(self, name):
+        """Per-row string codes of a column, read straight from the mapping."""
+        entry = self._columns[name]
+        start = entry['codes']
+        return self._view[start:start + 4 * self.rows].cast('I')
+
+    def strings(self, name):
+        """The decoded string table of a column, indexed by code."""
+        if name not in self._strings:
+            entry = self._columns[name]
+            offsets = self._view[entry['offsets']:entry['offsets'] + 4 * (entry['count'] + 1)].cast('I')
+            blob = bytes(self._view[entry['blob']:entry['blob'] + entry['blob_length']])
+            self._strings[name] = [
+                blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                for i in range(entry['count'])
+            ]
+        return self._strings[name]
+
+    def __iter__(self):
+        """Yields each row as a dict, like csv.DictReader."""
+        names = self.columns
+        tables = [self.strings(name) for name in names]
+        codes = [self.codes(name) for name in names]
+        for row in range(self.rows):
+            yield {name: table[column[row]] for name, table, column in zip(names, tables, codes)}
+
+
+def open_compiled(csv_path):
+    """
+    Opens the compiled form of a CSV dataset, (re)compiling it first when
+    it is missing or the CSV's mtime and content hash no longer match.
+    """
+    path = compiled_path(csv_path)
+    try:
+        dataset = CompiledDataset(path)
+        if dataset.is_current(csv_path):
+            return dataset
+    except (OSError, ValueError):
+        pass
+    compile_dataset(csv_path, path)
+    return CompiledDataset(path)
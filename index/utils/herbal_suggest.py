@@ -0,0 +1,63 @@
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+# Prefixes up to this length have their completions precomputed, since
+# they span the largest ranges of the sorted term array
+PRECOMPUTED_PREFIX_LENGTH = 2
+MAX_SUGGESTIONS = 20
+
+
+class SuggestionIndex:
+    """
+    Autocomplete over the symptom and use terms of the dataset: every
+    comma-separated phrase of the conditions and uses fields, and every
+    word of those phrases. Terms are kept in one sorted array, so the
+    completions of a prefix are a contiguous range found by bisection,
+    and each term is weighted by the number of dataset rows carrying it.
+    """
+
+    def __init__(self, herbs):
+        weights = defaultdict(int)
+        labels = {}
+        for herb in herbs:
+            rows = herb.get("variant_count", 1)
+            terms = {}
+            for field in (herb["description"], herb["uses"]):
+                for phrase in field.split(","):
+                    phrase = phrase.strip()
+                    if not phrase:
+                        continue
+                    terms.setdefault(phrase.lower(), phrase)
+                    for word in phrase.split():
+                        if len(word) > 2 and word.isalpha():
+                            terms.setdefault(word.lower(), word.lower())
+            for term, label in terms.items():
+                weights[term] += rows
+                labels.setdefault(term, label)
+
+        self.terms = sorted(weights)
+        self.weights = [weights[term] for term in self.terms]
+        self.labels = [labels[term] for term in self.terms]
+        self.top = {}
+        for term in self.terms:
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                prefix = term[:length]
+                if len(prefix) == length and prefix not in self.top:
+                    self.top[prefix] = self._complete(prefix, MAX_SUGGESTIONS)
+
+    def _complete(self, prefix, limit):
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + "\uffff", start)
+        best = heapq.nsmallest(limit, range(start, end), key=lambda i: (-self.weights[i], i))
+        return [{"term": self.labels[i], "weight": self.weights[i]} for i in best]
+
+    def suggest(self, prefix, limit=8):
+        """Returns the heaviest terms starting with prefix, heaviest first."""
+        prefix = prefix.strip().lower()
+        limit = max(0, min(limit, MAX_SUGGESTIONS))
+        if not prefix or not limit:
+            return []
+        if prefix in self.top:
+            return self.top[prefix][:limit]
+        return self._complete(prefix, limit)
@@ -0,0 +1,105 @@
+import csv
+from collections import defaultdict
+from pathlib import Path
+
+from .herbal_facets import bitmap_from_ids
+
+# Symptom phrases mapped to the dataset terms they mean (update as needed)
+HERBAL_SYNONYMS_PATH = Path("datasets/herbal_synonyms.csv")
+
+# Expansions must weigh less than a direct match: in count mode any typed
+# keyword scores 1, and under bm25 or tfidf an expansion term scores at
+# most this share of what the same term scores when typed. Terms differ in
+# weight there, so an expansion can still outrank a rarer typed word.
+MAX_EXPANSION_WEIGHT = 0.9
+
+
+def load_synonyms(path=None):
+    """
+    Reads the synonym file into {phrase: [(term, weight), ...]}, where a
+    phrase is a tuple of lowercase words, e.g. ("high", "blood", "sugar").
+    """
+    path = path or HERBAL_SYNONYMS_PATH
+    synonyms = defaultdict(list)
+    if not path.exists():
+        return synonyms
+    with open(path, mode='r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            phrase = tuple((row.get("Phrase") or "").lower().split())
+            term = (row.get("Expands To") or "").strip().lower()
+            if not phrase or not term:
+                continue
+            try:
+                weight = float(row.get("Weight") or 0.5)
+            except ValueError:
+                weight = 0.5
+            synonyms[phrase].append((term, min(max(weight, 0.0), MAX_EXPANSION_WEIGHT)))
+    return synonyms
+
+
+class SynonymTable:
+    """
+    Synonym phrases compiled against an index at load time: for every
+    phrase and scoring mode, the weighted scores its expansion terms give
+    each herb are summed into one table, so an expanded query still costs
+    a single lookup per phrase.
+    """
+
+    def __init__(self, synonyms, index):
+        self.expansions = {phrase: [term for term, _ in terms] for phrase, terms in synonyms.items()}
+        self.max_length = max((len(phrase) for phrase in synonyms), default=0)
+        self.tables = {"count": {}}
+        self.tables.update({name: {} for name in index.rankers})
+        self.bitmaps = {}
+        # Phrases the dataset itself uses, like "blood pressure", also match
+        # their words directly
+        self.in_dataset = {phrase for phrase in synonyms if index.contains_phrase(phrase)}
+        for phrase, terms in synonyms.items():
+            count = defaultdict(float)
+            herb_ids = set()
+            for term, weight in terms:
+                for herb_id in index.postings.get(term, ()):
+                    count[herb_id] = max(count[herb_id], weight)
+                    herb_ids.add(herb_id)
+            self.tables["count"][phrase] = dict(count)
+            self.bitmaps[phrase] = bitmap_from_ids(herb_ids, len(index.herbs))
+            for name, ranker in index.rankers.items():
+                scores = defaultdict(float)
+                for term, weight in terms:
+                    column = ranker.columns.get(term)
+                    if column is None:
+                        continue
+                    for herb_id, term_weight in zip(*column):
+                        scores[herb_id] += weight * ranker.query_weights[term] * term_weight
+                self.tables[name][phrase] = dict(scores)
+
+    def find(self, keywords):
+        """
+        Returns the synonym phrases occurring in a keyword sequence,
+        matched greedily from the left with the longest phrase first, so
+        each word belongs to one phrase at most.
+        """
+        return self.split(keywords)[0]
+
+    def split(self, keywords):
+        """
+        Splits a keyword sequence into the synonym phrases it holds, as
+        find() does, and the keywords to match directly: those outside the
+        phrases and the words of the phrases the dataset uses. The words of
+        the others, like "blood" in "high blood sugar", are left out.
+        """
+        phrases, rest = [], []
+        position = 0
+        while position < len(keywords):
+            for length in range(min(self.max_length, len(keywords) - position), 0, -1):
+                phrase = tuple(keywords[position:position + length])
+                if phrase in self.expansions:
+                    phrases.append(phrase)
+                    if phrase in self.in_dataset:
+                        rest.extend(phrase)
+                    position += length
+                    break
+            else:
+                rest.append(keywords[position])
+                position += 1
+        return phrases, rest
@@ -0,0 +1,65 @@
+import re
+from collections import Counter
+
+VARIANT_SUFFIX = re.compile(r'\s+Variant[-\s]*\d+$', re.IGNORECASE)
+
+# Fields holding comma-separated values, merged across variants
+MERGED_FIELDS = ("description", "uses", "compounds", "preparation",
+                 "side_effects", "interactions", "region")
+# Placeholder some variants carry where others list side effects or
+# interactions; kept only when no variant lists any
+NONE_KNOWN = "none known"
+
+
+def canonical_name(name):
+    """'Neem Variant-3' -> 'Neem'."""
+    return VARIANT_SUFFIX.sub("", name)
+
+
+def _add_parts(parts, value):
+    """Adds the distinct comma-separated parts of value, first seen first."""
+    for part in value.split(","):
+        part = part.strip()
+        if part:
+            parts.setdefault(part.lower(), part)
+
+
+def collapse_variants(herbs):
+    """
+    Groups herb rows by botanical name (or by canonical name when that is
+    missing) into one canonical herb each. Comma-separated fields are
+    merged ("None known" only when no variant has a real value), the
+    dosage is the most common one, and the variant names are
+    returned per canonical herb, in the same order as the herbs. Rows are
+    folded in as they stream past, so they never all sit in memory.
+    """
+    groups = {}
+    for herb in herbs:
+        name = canonical_name(herb["name"])
+        key = herb["scientific_name"] if herb["scientific_name"] != "N/A" else name.lower()
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "herb": {**herb, "name": name},
+                "parts": {field: {} for field in MERGED_FIELDS},
+                "dosages": Counter(),
+                "variants": [],
+            }
+        for field in MERGED_FIELDS:
+            _add_parts(group["parts"][field], herb[field])
+        group["dosages"][herb["dosage"]] += 1
+        group["variants"].append(herb["name"])
+
+    canonical = []
+    variants = []
+    for group in groups.values():
+        herb = group["herb"]
+        for field, parts in group["parts"].items():
+            if len(parts) > 1:
+                parts.pop(NONE_KNOWN, None)
+            herb[field] = ", ".join(parts.values())
+        herb["dosage"] = group["dosages"].most_common(1)[0][0]
+        herb["variant_count"] = len(group["variants"])
+        canonical.append(herb)
+        variants.append(tuple(group["variants"]))
+    return canonical, variants
@@ -1,15 +1,27 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponseServerError, HttpResponseNotFound
-from django.views.decorators.csrf import requires_csrf_token
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseServerError, HttpResponseNotFound
+from django.views.decorators.csrf import csrf_exempt, requires_csrf_token
+from django.views.decorators.http import require_POST
+from django.contrib.admin.views.decorators import staff_member_required
 from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.conf import settings
+import hashlib
+import json
 import uuid
 import logging
 from django.core.mail import send_mail
 from django.contrib import messages
-from .utils.herbal_analyzer import analyze_herbal_symptoms
+from ailixir.page_cache import cache_anonymous_page
+from .utils.herbal_analyzer import (
+    herbal_data_version, search_herbs, analyze_herbal_batch, suggest_herbal_terms, check_herbal_interactions, query_cache, FACETS, MATCH_MODES, RANKINGS,
+)
+from .utils.herbal_index import extract_keywords
 from .models import SocialHandle, Product
 # Create your views here.
 
+@cache_anonymous_page('site', 'products')
 def homepage(request):
   context = {}
   products = Product.objects.all()
@@ -40,9 +52,11 @@ we all from Ailixir Global Limited, we say THANK YOU!
     messages.add_message(request, messages.INFO,'Thank You for contacting Us.')
   return redirect('home')
   
+@cache_anonymous_page('site')
 def aboutpage(request):
   return render(request, 'index/aboutpage.html')
 
+@cache_anonymous_page('site')
 def contactpage(request):
   return render(request, 'index/contactpage.html')
 
@@ -51,14 +65,125 @@ def vision_missionpage(request):
 
 
 
+def get_herbal_options(request):
+    """Reads the engine options shared by the recommendation endpoints."""
+    match = request.GET.get("match", "token")
+    if match not in MATCH_MODES:
+        return None, JsonResponse({'error': f'match must be one of {", ".join(MATCH_MODES)}'}, status=400)
+    ranking = request.GET.get("ranking", "count")
+    if ranking not in RANKINGS:
+        return None, JsonResponse({'error': f'ranking must be one of {", ".join(RANKINGS)}'}, status=400)
+    # A blank value, as in ?region=, filters nothing
+    filters = {}
+    for facet in FACETS:
+        values = [value for value in request.GET.getlist(facet) if value.strip()]
+        if values:
+            filters[facet] = values
+    fuzzy = request.GET.get("fuzzy")
+    if fuzzy is not None:
+        fuzzy = fuzzy.lower() not in ("0", "false", "off")
+    return {"match": match, "ranking": ranking, "filters": filters, "fuzzy": fuzzy}, None
+
+
 def herbal_recommendation_api(request):
     """
     API endpoint for herbal recommendations.
     Example: /api/herbal?symptoms=fever, headache
+    Pass match=substring to score with the original substring matching,
+    and ranking=bm25 or ranking=tfidf to rank by relevance instead of the
+    raw keyword count.
+    Facet filters narrow the results, e.g. region=Asia&form=tea; the
+    response carries the facet counts of all matching herbs.
+    fuzzy=0 turns off the correction of misspelt symptoms.
+    """
+    symptoms = request.GET.get("symptoms", "")
+    options, error = get_herbal_options(request)
+    if error:
+        return error
+    found = search_herbs(symptoms, **options)
+    return JsonResponse({"symptoms": symptoms, **found})
+
+
+def herbal_recommendation_partial(request):
+    """
+    Renders the recommendation cards for the homepage widget, which asks
+    for them through htmx as the visitor types. The rendered fragment is
+    cached per normalized query (a hash of its lowercase keywords, in
+    order) and version of the herb data, so repeated and near-identical
+    queries skip both the search and the template.
     """
     symptoms = request.GET.get("symptoms", "")
-    results = analyze_herbal_symptoms(symptoms)
-    return JsonResponse({"symptoms": symptoms, "results": results})
+    keywords = extract_keywords(symptoms)
+    if not keywords:
+        return HttpResponse("")
+    digest = hashlib.md5(' '.join(keywords).encode()).hexdigest()
+    key = f"herbs-partial:{herbal_data_version()}:{digest}"
+    html = cache.get(key)
+    if html is None:
+        found = search_herbs(symptoms)
+        html = render_to_string('index/partials/recommendation_results.html', {"symptoms": symptoms, **found})
+        cache.set(key, html, getattr(settings, 'HERBAL_QUERY_CACHE_TTL', 300))
+    return HttpResponse(html)
+
+
+def herbal_suggest_api(request):
+    """
+    Autocomplete endpoint for the recommendation box.
+    Example: /herbs-recom/suggest/?prefix=fever, sk
+    """
+    prefix = request.GET.get("prefix", "")
+    try:
+        limit = int(request.GET.get("limit", 8))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    return JsonResponse({"prefix": prefix, "suggestions": suggest_herbal_terms(prefix, limit)})
+
+
+def herbal_interactions_api(request):
+    """
+    Interaction checker for a regimen of herbs and drug classes.
+    Example: /herbs-recom/interactions/?items=Ginger,Neem,warfarin
+    """
+    items = [item for value in request.GET.getlist("items") for item in value.split(",") if item.strip()]
+    if not items:
+        return JsonResponse({'error': 'No herbs or drug classes provided'}, status=400)
+    return JsonResponse({"items": items, **check_herbal_interactions(items)})
+
+
+@csrf_exempt
+@require_POST
+def herbal_recommendation_batch_api(request):
+    """
+    Batch API endpoint for herbal recommendations.
+    POST a JSON array of at most HERBAL_BATCH_MAX_SIZE symptom strings,
+    e.g. ["fever, headache", "cough"]; accepts the same query parameters
+    as herbal_recommendation_api.
+    Results stream back as NDJSON, one line per symptom string, in order.
+    """
+    try:
+        symptoms_list = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(symptoms_list, list) or not all(isinstance(s, str) for s in symptoms_list):
+        return JsonResponse({'error': 'Expected a JSON array of symptom strings'}, status=400)
+    max_batch = getattr(settings, 'HERBAL_BATCH_MAX_SIZE', 100)
+    if len(symptoms_list) > max_batch:
+        return JsonResponse({'error': f'At most {max_batch} symptom strings per batch'}, status=400)
+    options, error = get_herbal_options(request)
+    if error:
+        return error
+
+    lines = (
+        json.dumps({"symptoms": symptoms, "results": results}) + "\n"
+        for symptoms, results in zip(symptoms_list, analyze_herbal_batch(symptoms_list, **options))
+    )
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+@staff_member_required
+def herbal_cache_stats_api(request):
+    """Hit/miss/eviction/expiry counters of this worker's recommendation cache."""
+    return JsonResponse(query_cache.stats())
   
   
 